@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import re
+from dataclasses import dataclass, field
+
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.tools import BaseTool
+from mcp_use import MCPAgent
+from mcp_use.adapters.langchain_adapter import LangChainAdapter
+
+from connection_pool import ConnectionPool, PooledMCPClient
+
+logger = logging.getLogger("mcp-host.templates")
+
+# Per-user fields left open in a compiled prompt
+PROMPT_FIELDS = ("{user_id}", "{date_time}")
+_FIELD_PATTERN = re.compile("(" + "|".join(re.escape(f) for f in PROMPT_FIELDS) + ")")
+
+
+def compile_prompt(template: str, tool_descriptions: str) -> list[str]:
+    """Substitute the profile-wide parts once and split around the per-user fields."""
+    return _FIELD_PATTERN.split(template.replace("{tool_descriptions}", tool_descriptions))
+
+
+@dataclass
+class AgentTemplate:
+    profile_name: str
+    servers: dict[str, dict]
+    prompt_parts: list[str]
+    tools: list[BaseTool]
+    tool_schemas: list[dict]
+    tools_versions: dict[str, int] = field(default_factory=dict)
+
+    def render_prompt(self, user_id: str, date_time: str) -> str:
+        values = {"{user_id}": user_id, "{date_time}": date_time}
+        return "".join(values.get(part, part) for part in self.prompt_parts)
+
+
+class CachedToolAdapter(LangChainAdapter):
+    """
+    Adapter that hands MCPAgent an already converted tool list instead of rediscovering it.
+    MCPAgent calls adapter.create_tools(client) in mcp_use 1.3.x, hence the pin in requirements.txt.
+    """
+
+    def __init__(self, tools: list[BaseTool], disallowed_tools: list[str] | None = None):
+        super().__init__(disallowed_tools=disallowed_tools)
+        self._tools = tools
+
+    async def create_tools(self, client, disallowed_tools: list[str] | None = None) -> list[BaseTool]:
+        return [tool for tool in self._tools if tool.name not in self.disallowed_tools]
+
+
+class AgentTemplateCache:
+    """
+    Per-profile prompt and LangChain tools built from the pooled sessions.
+    An entry is rebuilt when any of its servers reports a new tool list version.
+    """
+
+    def __init__(self, pool: ConnectionPool, prompt_template: str):
+        self.pool = pool
+        self.prompt_template = prompt_template
+        self._templates: dict[str, AgentTemplate] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self.metrics = {"hits": 0, "builds": 0}
+
+    async def get(self, profile_name: str, servers: dict[str, dict], tool_descriptions: str) -> AgentTemplate:
+        template = self._templates.get(profile_name)
+        if template and template.tools_versions == self.pool.tools_versions(servers):
+            self.metrics["hits"] += 1
+            return template
+
+        async with self._locks.setdefault(profile_name, asyncio.Lock()):
+            template = self._templates.get(profile_name)
+            if template and template.tools_versions == self.pool.tools_versions(servers):
+                self.metrics["hits"] += 1
+                return template
+            template = await self._build(profile_name, servers, tool_descriptions)
+            self._templates[profile_name] = template
+            return template
+
+    async def _build(self, profile_name: str, servers: dict[str, dict], tool_descriptions: str) -> AgentTemplate:
+        client = self.pool.client_for(servers)
+        sessions = await client.create_all_sessions()
+        adapter = LangChainAdapter()
+        tools: list[BaseTool] = []
+        schemas: list[dict] = []
+        for server_name, session in sessions.items():
+            tools.extend(await adapter.load_tools_for_connector(session.connector))
+            schemas.extend(
+                {
+                    "server": server_name,
+                    "name": tool.name,
+                    "description": tool.description,
+                    "input_schema": tool.inputSchema,
+                }
+                for tool in session.connector.tools
+            )
+        self.metrics["builds"] += 1
+        logger.info(f"Built agent template for '{profile_name}' with {len(tools)} tools")
+        return AgentTemplate(
+            profile_name=profile_name,
+            servers=servers,
+            prompt_parts=compile_prompt(self.prompt_template, tool_descriptions),
+            tools=tools,
+            tool_schemas=schemas,
+            tools_versions=self.pool.tools_versions(servers),
+        )
+
+    def build_agent(
+        self, template: AgentTemplate, llm: BaseLanguageModel, system_prompt_template: str
+    ) -> tuple[MCPAgent, PooledMCPClient]:
+        client = self.pool.client_for(template.servers)
+        agent = MCPAgent(
+            llm=llm,
+            client=client,
+            system_prompt_template=system_prompt_template,
+            memory_enabled=True,
+            max_steps=10,
+            verbose=True,
+        )
+        agent.adapter = CachedToolAdapter(template.tools)
+        return agent, client
+
+    def invalidate(self, profile_name: str | None = None) -> None:
+        if profile_name is None:
+            self._templates.clear()
+        else:
+            self._templates.pop(profile_name, None)
+
+    def stats(self) -> dict:
+        return {"templates": len(self._templates), **self.metrics}
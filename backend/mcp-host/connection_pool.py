@@ -0,0 +1,277 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+from contextvars import ContextVar
+
+from mcp_use import MCPClient
+from mcp_use.session import MCPSession
+
+logger = logging.getLogger("mcp-host.pool")
+
+# Config
+POOL_MAX_CONCURRENCY = int(os.getenv("POOL_MAX_CONCURRENCY", "16"))
+POOL_HEALTH_INTERVAL_SECONDS = float(os.getenv("POOL_HEALTH_INTERVAL_SECONDS", "30"))
+POOL_BACKOFF_BASE_SECONDS = float(os.getenv("POOL_BACKOFF_BASE_SECONDS", "1"))
+POOL_BACKOFF_MAX_SECONDS = float(os.getenv("POOL_BACKOFF_MAX_SECONDS", "60"))
+POOL_CONNECT_TIMEOUT_SECONDS = float(os.getenv("POOL_CONNECT_TIMEOUT_SECONDS", "20"))
+
+
+# Names of the servers whose tools were called during the current request, when tracing
+_tool_trace: ContextVar[set[str] | None] = ContextVar("tool_trace", default=None)
+
+
+def start_tool_trace() -> set[str]:
+    """Record server names of tool calls made from this context (and tasks it spawns)."""
+    trace: set[str] = set()
+    _tool_trace.set(trace)
+    return trace
+
+
+class ServerUnavailable(RuntimeError):
+    pass
+
+
+class PooledServer:
+    """One long-lived MCP session to a server, shared by every agent that uses it."""
+
+    def __init__(self, name: str, config: dict, max_concurrency: int):
+        self.name = name
+        self.config = config
+        self.url = config.get("url", name)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.connect_lock = asyncio.Lock()
+        self.session: MCPSession | None = None
+        self.healthy = False
+        self.failures = 0
+        self.retry_at = 0.0
+        self.in_flight = 0
+        self.tools_fingerprint: str | None = None
+        self.tools_version = 0
+        self.metrics = {"connects": 0, "reconnects": 0, "connect_errors": 0, "calls": 0, "call_errors": 0}
+
+    def _backoff(self) -> float:
+        delay = min(POOL_BACKOFF_MAX_SECONDS, POOL_BACKOFF_BASE_SECONDS * 2 ** max(self.failures - 1, 0))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _open(self) -> None:
+        if self.session is None:
+            client = MCPClient.from_dict({"mcpServers": {self.name: self.config}})
+            session = await client.create_session(self.name)
+            self._limit_calls(session)
+            self.session = session
+        else:
+            # Reconnect in place so LangChain tools bound to this connector keep working.
+            try:
+                await self.session.disconnect()
+            except Exception as e:
+                logger.debug(f"Ignoring disconnect error for {self.url}: {e}")
+            await self.session.initialize()
+            self.metrics["reconnects"] += 1
+
+    def _update_fingerprint(self, tools) -> None:
+        payload = json.dumps(
+            sorted((tool.name, tool.description or "", tool.inputSchema) for tool in tools),
+            sort_keys=True,
+            default=str,
+        )
+        fingerprint = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        if fingerprint != self.tools_fingerprint:
+            if self.tools_fingerprint is not None:
+                logger.info(f"Tool list changed on {self.url}")
+            self.tools_fingerprint = fingerprint
+            self.tools_version += 1
+
+    async def refresh_tools(self) -> None:
+        connector = self.session.connector
+        tools = await asyncio.wait_for(connector.list_tools(), timeout=POOL_CONNECT_TIMEOUT_SECONDS)
+        # Keep the connector's cached list current so newly built LangChain tools match the server.
+        connector._tools = tools
+        self._update_fingerprint(tools)
+
+    def _limit_calls(self, session: MCPSession) -> None:
+        connector = session.connector
+        call_tool = connector.call_tool
+
+        async def limited_call_tool(name, arguments):
+            trace = _tool_trace.get()
+            if trace is not None:
+                trace.add(self.name)
+            async with self.semaphore:
+                self.in_flight += 1
+                self.metrics["calls"] += 1
+                try:
+                    return await call_tool(name, arguments)
+                except Exception:
+                    self.metrics["call_errors"] += 1
+                    if not connector.is_connected:
+                        self.healthy = False
+                    raise
+                finally:
+                    self.in_flight -= 1
+
+        connector.call_tool = limited_call_tool
+
+    async def ensure(self) -> MCPSession:
+        if self.healthy and self.session is not None:
+            return self.session
+        async with self.connect_lock:
+            if self.healthy and self.session is not None:
+                return self.session
+            now = time.monotonic()
+            if now < self.retry_at:
+                raise ServerUnavailable(f"{self.url} unavailable, retrying in {self.retry_at - now:.1f}s")
+            try:
+                await asyncio.wait_for(self._open(), timeout=POOL_CONNECT_TIMEOUT_SECONDS)
+            except Exception as e:
+                self.healthy = False
+                self.failures += 1
+                self.retry_at = time.monotonic() + self._backoff()
+                self.metrics["connect_errors"] += 1
+                raise ServerUnavailable(f"Failed to connect to {self.url}: {e}") from e
+            self.healthy = True
+            self.failures = 0
+            self.retry_at = 0.0
+            self._update_fingerprint(self.session.connector.tools)
+            self.metrics["connects"] += 1
+            logger.info(f"Connected pooled session to {self.url}")
+            return self.session
+
+    async def check(self) -> bool:
+        if self.session is None:
+            return False
+        if self.healthy:
+            try:
+                client_session = self.session.connector.client_session
+                await asyncio.wait_for(client_session.send_ping(), timeout=POOL_CONNECT_TIMEOUT_SECONDS)
+                await self.refresh_tools()
+                return True
+            except Exception as e:
+                logger.warning(f"Health check failed for {self.url}: {e}")
+                self.healthy = False
+        try:
+            await self.ensure()
+            return True
+        except ServerUnavailable as e:
+            logger.warning(str(e))
+            return False
+
+    async def close(self) -> None:
+        if self.session is not None:
+            try:
+                await self.session.disconnect()
+            except Exception as e:
+                logger.warning(f"Error closing pooled session to {self.url}: {e}")
+        self.session = None
+        self.healthy = False
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "in_flight": self.in_flight,
+            "failures": self.failures,
+            "tools_version": self.tools_version,
+            **self.metrics,
+        }
+
+
+class ConnectionPool:
+    """
+    Process-wide MCP sessions keyed by server URL. Tool calls from every agent
+    are multiplexed over one session per server, bounded by a per-server semaphore.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = POOL_MAX_CONCURRENCY,
+        health_interval: float = POOL_HEALTH_INTERVAL_SECONDS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.health_interval = health_interval
+        self._servers: dict[str, PooledServer] = {}
+        self._health_task: asyncio.Task | None = None
+
+    def _server(self, name: str, config: dict) -> PooledServer:
+        url = config.get("url", name)
+        server = self._servers.get(url)
+        if server is None:
+            server = PooledServer(name, config, self.max_concurrency)
+            self._servers[url] = server
+        return server
+
+    async def session(self, name: str, config: dict) -> MCPSession:
+        return await self._server(name, config).ensure()
+
+    def tools_versions(self, servers: dict[str, dict]) -> dict[str, int]:
+        versions = {}
+        for name, config in servers.items():
+            server = self._servers.get(config.get("url", name))
+            versions[name] = server.tools_version if server and server.healthy else 0
+        return versions
+
+    def client_for(self, servers: dict[str, dict]) -> "PooledMCPClient":
+        return PooledMCPClient(self, servers)
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for server in list(self._servers.values()):
+                await server.check()
+
+    def start(self) -> None:
+        if self._health_task is None and self.health_interval > 0:
+            self._health_task = asyncio.get_running_loop().create_task(self._health_loop())
+
+    async def shutdown(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for server in self._servers.values():
+            await server.close()
+
+    def stats(self) -> dict:
+        return {url: server.stats() for url, server in self._servers.items()}
+
+
+class PooledMCPClient(MCPClient):
+    """
+    MCPClient facade handed to MCPAgent. Sessions come from the shared pool, and
+    closing them only drops this client's references.
+    """
+
+    def __init__(self, pool: ConnectionPool, servers: dict[str, dict]):
+        super().__init__(config={"mcpServers": servers})
+        self.pool = pool
+
+    async def create_session(self, server_name: str, auto_initialize: bool = True) -> MCPSession:
+        servers = self.config.get("mcpServers", {})
+        if server_name not in servers:
+            raise ValueError(f"Server '{server_name}' not found in config")
+        session = await self.pool.session(server_name, servers[server_name])
+        self.sessions[server_name] = session
+        if server_name not in self.active_sessions:
+            self.active_sessions.append(server_name)
+        return session
+
+    async def create_all_sessions(self, auto_initialize: bool = True) -> dict[str, MCPSession]:
+        names = list(self.config.get("mcpServers", {}))
+        results = await asyncio.gather(
+            *(self.create_session(name) for name in names), return_exceptions=True
+        )
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Skipping unavailable server '{name}': {result}")
+        return self.sessions
+
+    async def close_session(self, server_name: str) -> None:
+        self.sessions.pop(server_name, None)
+        if server_name in self.active_sessions:
+            self.active_sessions.remove(server_name)
+
+    async def close_all_sessions(self) -> None:
+        for server_name in list(self.sessions):
+            await self.close_session(server_name)
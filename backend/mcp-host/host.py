@@ -4,14 +4,38 @@ from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from pathlib import Path
+import asyncio
+from contextlib import aclosing
 import uuid
+import sys
 import os
 
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
-from mcp_use import MCPAgent, MCPClient, set_debug
+from mcp_use import set_debug
 from datetime import datetime
 
+# Loaded before the sibling modules below, which read their config at import time
 load_dotenv(dotenv_path=Path(__file__).parent.parent / ".env")
+
+# Sibling modules are importable both via `uvicorn mcp-host.host:app` and `--app-dir mcp-host`
+sys.path.insert(0, str(Path(__file__).parent))
+from agent_templates import AgentTemplateCache
+from connection_pool import ConnectionPool, start_tool_trace
+from response_cache import ResponseCache, cache_namespace
+from session_manager import SessionManager
+from streaming import agent_events, sse_response
+from user_context import UserContextCache
+from request_guard import (
+    ASK_DEADLINE_SECONDS,
+    ClientDisconnected,
+    SessionBusy,
+    is_superseded,
+    run_until_disconnect,
+    session_guard,
+    would_reject,
+)
+
 set_debug(2)
 
 MODE = os.getenv("MODE", "dev")
@@ -34,9 +58,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-agent_store: dict[str, dict[str, MCPAgent]] = {}
-active_profiles: dict[str, str] = {}
-session_clients: dict[str, MCPClient] = {}
+sessions = SessionManager()
+connection_pool = ConnectionPool()
 
 AGENTS = {
     "docingestor": {
@@ -71,6 +94,10 @@ AGENTS = {
     },
 }
 
+user_contexts = UserContextCache(
+    connection_pool, "employeedetails", AGENTS["employee"]["server"]["employeedetails"]
+)
+
 DEFAULT_PROFILES = [
      {
         "title": "Core Assistant",
@@ -129,7 +156,7 @@ Follow this approach for each query:
 1. Understand the user's goal clearly.
 2. Decide which available tool(s) can best help — use one or more.
 3. Run smart queries or actions directly — don't ask which tool to use.
-4. Retry with better queries or synonyms if needed.
+4. Document search already matches exact terms and meaning together — only retry with a different query if the results are clearly off-topic.
 5. If all tools fail, politely ask for more context.
 
 ---
@@ -187,6 +214,9 @@ You adapt based on the tools you have — be sharp, supportive, and solution-foc
 Respond in Markdown format
 """
 
+agent_templates = AgentTemplateCache(connection_pool, custom_prompt_template)
+response_cache = ResponseCache()
+
 @app.on_event("startup")
 async def startup_event():
     app.state.llm = ChatGoogleGenerativeAI(
@@ -194,6 +224,41 @@ async def startup_event():
         google_api_key=os.getenv("GOOGLE_API_KEY"),
         temperature=0.5,
     )
+    sessions.start()
+    connection_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await sessions.shutdown()
+    await connection_pool.shutdown()
+
+# Build the user context section of the system prompt
+async def user_context_snippet(user_id: str | None, tools: dict) -> str:
+    if not user_id:
+        return "\n\n## 👤 User Context\nUnknown user"
+    if "employeedetails" not in tools:
+        return f"\n\n## 👤 User Context\nUser ID: {user_id}"
+    try:
+        details = await user_contexts.get(user_id)
+    except Exception as e:
+        print(f"⚠️ Failed to fetch user info: {e}")
+        return f"\n\n## 👤 User Context\nUser ID: {user_id}"
+    # MCPAgent formats the prompt template, so braces in tool output must be escaped
+    details = details.replace("{", "{{").replace("}", "}}")
+    return f"\n\n## 👤 User Context\n{details}"
+
+# Record a cached answer in agent memory so follow-up questions keep their context
+def remember_exchange(agent, query: str, response: str):
+    if agent.memory_enabled:
+        agent.add_to_history(HumanMessage(content=query))
+        agent.add_to_history(AIMessage(content=response))
+
+# Response cache scope for this agent's next query; None once the conversation has history,
+# since the answer may then depend on earlier turns
+def response_cache_scope(entry, profile_name: str, agent) -> str | None:
+    if any(not isinstance(message, SystemMessage) for message in agent.get_conversation_history()):
+        return None
+    return cache_namespace(profile_name, entry.user_ids.get(profile_name))
 
 class QueryInput(BaseModel):
     query: str
@@ -226,8 +291,8 @@ async def switch_profile(
         return JSONResponse(status_code=404, content={"error": "Profile not found"})
 
     # Return existing agent if already set
-    if session_id in agent_store and profile_name in agent_store[session_id]:
-        active_profiles[session_id] = profile_name
+    if sessions.get_agent(session_id, profile_name):
+        sessions.set_active_profile(session_id, profile_name)
         response = JSONResponse({
             "message": f"Switched to profile '{profile_name}' (existing agent)",
             "profile": profile_name,
@@ -247,55 +312,20 @@ async def switch_profile(
         [f"- `{key}`: {AGENTS[key]['description']}" for key in agent_keys]
     )
 
-    # Optional: Fetch user details if user_id is present
-    user_info_snippet = ""
-    if user_id:
-        print(f"Tools available: {tools.keys()}")
-        try:
-            if "employeedetails" in tools.keys():
-                temp_client = MCPClient.from_dict({"mcpServers": AGENTS["employee"]["server"]})
-                session = await temp_client.create_session("employeedetails")
-
-                result = await session.call_tool("Get_Employee_Details", {"id": user_id})
-                print(f"User info fetched: {result}")
-                # Extract text from result.content
-                # text_content = ""
-                # if hasattr(result, "content") and result.content:
-                #     text_content = "\n".join(
-                #         getattr(item, "text", "") for item in result.content if hasattr(item, "text")
-                #     )
-                user_info_snippet = f"\n\n## 👤 User Context\n{result}"
-                await temp_client.close_all_sessions()
-            else:
-                user_info_snippet = f"\n\n## 👤 User Context\nUser ID: {user_id}"
-        except Exception as e:
-            print(f"⚠️ Failed to fetch user info: {e}")
-            user_info_snippet = f"\n\n## 👤 User Context\nUser ID: {user_id}"
-    else:
-        user_info_snippet = "\n\n## 👤 User Context\nUnknown user"
+    # Fetch user context (cached per user_id) while the profile's cached template is resolved
+    user_info_snippet, template = await asyncio.gather(
+        user_context_snippet(user_id, tools),
+        agent_templates.get(profile_name, tools, tool_descriptions),
+    )
 
     # Final system prompt
     current_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    final_prompt = custom_prompt_template \
-        .replace("{tool_descriptions}", tool_descriptions) \
-        .replace("{user_id}", user_id or "unknown") \
-        .replace("{date_time}", current_datetime) \
-        + user_info_snippet
-
-    # Initialize MCP client and agent
-    client = MCPClient.from_dict({"mcpServers": tools})
-    session_clients[session_id] = client
-    agent = MCPAgent(
-        llm=app.state.llm,
-        client=client,
-        system_prompt_template=final_prompt,
-        memory_enabled=True,
-        max_steps=10,
-        verbose=True,
-    )
+    final_prompt = template.render_prompt(user_id or "unknown", current_datetime) + user_info_snippet
 
-    agent_store.setdefault(session_id, {})[profile_name] = agent
-    active_profiles[session_id] = profile_name
+    # Initialize agent from the template on top of the shared, pooled MCP sessions
+    agent, client = agent_templates.build_agent(template, app.state.llm, final_prompt)
+
+    sessions.put_agent(session_id, profile_name, agent, client, user_id)
 
     response = JSONResponse({
         "message": f"Switched to profile '{profile_name}'",
@@ -310,24 +340,93 @@ async def switch_profile(
 @app.post("/ask")
 async def ask_query(query_input: QueryInput, request: Request):
     session_id = request.cookies.get("session_id")
-    if not session_id or session_id not in agent_store or session_id not in active_profiles:
+    entry = sessions.get(session_id)
+    if not entry:
         return JSONResponse(
             status_code=400,
             content={"error": "Session not initialized. Use /switch-profile to initialize."},
         )
 
-    profile_name = active_profiles[session_id]
-    agent = agent_store[session_id].get(profile_name)
-
-    if not agent:
+    active = sessions.get_active_agent(session_id)
+    if not active:
         return JSONResponse(status_code=404, content={"error": "Agent not found for current profile."})
+    profile_name, agent = active
 
     try:
-        result = await agent.run(query_input.query, max_steps=10)
+        # The deadline includes time spent queued behind another request on this session
+        async with asyncio.timeout(ASK_DEADLINE_SECONDS):
+            async with session_guard(entry):
+                cache_scope = response_cache_scope(entry, profile_name, agent)
+                hit, query_vector = await response_cache.lookup(cache_scope, query_input.query)
+                if hit:
+                    remember_exchange(agent, query_input.query, hit.response)
+                    return {"response": hit.response, "cached": True}
+
+                servers_used = start_tool_trace()
+                result = await run_until_disconnect(request, agent.run(query_input.query, max_steps=10), deadline=None)
+        await response_cache.store(cache_scope, query_input.query, query_vector, result, servers_used)
         return {"response": result}
+    except SessionBusy as e:
+        return JSONResponse(status_code=409, content={"error": str(e)})
+    except TimeoutError:
+        return JSONResponse(
+            status_code=504,
+            content={"error": f"Request exceeded the {ASK_DEADLINE_SECONDS:.0f}s deadline."},
+        )
+    except ClientDisconnected:
+        return Response(status_code=499)
+    except asyncio.CancelledError:
+        if not is_superseded():
+            raise
+        return JSONResponse(status_code=409, content={"error": "Request superseded by a newer one."})
     except Exception as e:
         return {"error": str(e)}
 
+# Ask query and stream tokens, tool steps and the final answer as server-sent events
+@app.post("/ask/stream")
+async def ask_query_stream(query_input: QueryInput, request: Request):
+    session_id = request.cookies.get("session_id")
+    entry = sessions.get(session_id)
+    if not entry:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Session not initialized. Use /switch-profile to initialize."},
+        )
+
+    active = sessions.get_active_agent(session_id)
+    if not active:
+        return JSONResponse(status_code=404, content={"error": "Agent not found for current profile."})
+    profile_name, agent = active
+
+    if would_reject(entry):
+        return JSONResponse(status_code=409, content={"error": "Another request is already running for this session."})
+
+    async def guarded_events():
+        try:
+            async with asyncio.timeout(ASK_DEADLINE_SECONDS):
+                async with session_guard(entry):
+                    cache_scope = response_cache_scope(entry, profile_name, agent)
+                    hit, query_vector = await response_cache.lookup(cache_scope, query_input.query)
+                    if hit:
+                        remember_exchange(agent, query_input.query, hit.response)
+                        yield {"type": "final", "response": hit.response, "cached": True}
+                        return
+
+                    servers_used = start_tool_trace()
+                    final = None
+                    async with aclosing(agent_events(agent, query_input.query, max_steps=10)) as events:
+                        async for event in events:
+                            if event["type"] == "final" and event.get("complete"):
+                                final = event["response"]
+                            yield event
+            await response_cache.store(cache_scope, query_input.query, query_vector, final, servers_used)
+        except SessionBusy as e:
+            yield {"type": "error", "error": str(e)}
+        except TimeoutError:
+            yield {"type": "error", "error": f"Request exceeded the {ASK_DEADLINE_SECONDS:.0f}s deadline."}
+
+    return sse_response(request, guarded_events())
+
 # List profiles (only names)
 @app.get("/profiles")
 async def get_profiles():
@@ -343,18 +442,23 @@ async def get_profiles():
 async def clear_session(request: Request):
     session_id = request.cookies.get("session_id")
     if session_id:
-        agent_store.pop(session_id, None)
-        active_profiles.pop(session_id, None)
-        try:
-            for client in session_clients.values():
-                await client.close_all_sessions()
-        except Exception as e:
-            print(f"⚠️ Error while closing agent for {session_id}: {e}")
+        await sessions.remove(session_id)
         response = JSONResponse({"message": "Session cleared."})
         response.delete_cookie("session_id")
         return response
     return Response(status_code=204)
 
+# Host cache, pool and session metrics
+@app.get("/metrics")
+async def metrics():
+    return {
+        "sessions": sessions.stats(),
+        "connection_pool": connection_pool.stats(),
+        "user_context": user_contexts.stats(),
+        "agent_templates": agent_templates.stats(),
+        "response_cache": response_cache.stats(),
+    }
+
 # Health check
 @app.get("/health")
 async def health_check():
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import os
+import weakref
+from contextlib import asynccontextmanager
+
+from fastapi import Request
+
+from session_manager import SessionEntry
+
+logger = logging.getLogger("mcp-host.guard")
+
+# Config
+# queue: wait for the running request, reject: answer 409, cancel: cancel the running request
+SESSION_CONCURRENCY_POLICY = os.getenv("SESSION_CONCURRENCY_POLICY", "queue").lower()
+ASK_DEADLINE_SECONDS = float(os.getenv("ASK_DEADLINE_SECONDS", "120"))
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "1"))
+
+POLICIES = ("queue", "reject", "cancel")
+SUPERSEDED = "superseded"
+if SESSION_CONCURRENCY_POLICY not in POLICIES:
+    raise ValueError(f"SESSION_CONCURRENCY_POLICY must be one of {POLICIES}, got '{SESSION_CONCURRENCY_POLICY}'")
+
+
+class SessionBusy(RuntimeError):
+    pass
+
+
+class ClientDisconnected(RuntimeError):
+    pass
+
+
+# Request tasks session_guard cancelled in favour of a newer request on the same session
+_superseded: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+
+
+def is_superseded() -> bool:
+    """
+    Call from an `except CancelledError` in the request task. True only if session_guard
+    superseded this task and nothing else (client disconnect, shutdown) cancelled it too;
+    the cancellation is then withdrawn so the caller can answer normally.
+    """
+    task = asyncio.current_task()
+    if task is None or task not in _superseded or task.cancelling() != 1:
+        return False
+    _superseded.discard(task)
+    task.uncancel()
+    return True
+
+
+def would_reject(entry: SessionEntry, policy: str = SESSION_CONCURRENCY_POLICY) -> bool:
+    return policy == "reject" and entry.lock.locked()
+
+
+@asynccontextmanager
+async def session_guard(entry: SessionEntry, policy: str = SESSION_CONCURRENCY_POLICY):
+    """
+    Run at most one agent request per session. The current task is recorded so
+    that a later request under the 'cancel' policy can cancel it.
+    """
+    if policy == "reject" and entry.lock.locked():
+        raise SessionBusy("Another request is already running for this session.")
+    if policy == "cancel" and entry.running is not None and not entry.running.done():
+        logger.info("Cancelling previous request for session")
+        _superseded.add(entry.running)
+        entry.running.cancel(msg=SUPERSEDED)
+
+    async with entry.lock:
+        entry.running = asyncio.current_task()
+        try:
+            yield
+        finally:
+            entry.running = None
+
+
+async def run_until_disconnect(request: Request, coro, deadline: float | None = ASK_DEADLINE_SECONDS):
+    """
+    Await coro under an overall deadline, cancelling it (and any in-flight tool
+    or LLM call) if the deadline passes or the client goes away. Pass deadline=None
+    when the caller already runs under one.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        async with asyncio.timeout(deadline):
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+                if done:
+                    return task.result()
+                if await request.is_disconnected():
+                    raise ClientDisconnected("Client disconnected, cancelling agent run")
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
@@ -0,0 +1,230 @@
+import importlib
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+logger = logging.getLogger("mcp-host.response_cache")
+
+# Config
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+# "memory" or "package.module:ClassName" for an external ResponseCacheBackend
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+RESPONSE_CACHE_EMBEDDING_MODEL = os.getenv("RESPONSE_CACHE_EMBEDDING_MODEL", "models/embedding-001")
+# Answers are only cached when every tool they used came from these servers
+RESPONSE_CACHE_SAFE_SERVERS = set(
+    filter(None, os.getenv("RESPONSE_CACHE_SAFE_SERVERS", "DocIngestorandRetrival").split(","))
+)
+
+# MCPAgent.run (mcp_use 1.3) and AgentExecutor return these as the answer instead of raising
+# when a step fails or the step limit is hit
+INCOMPLETE_ANSWER_PREFIXES = (
+    "Agent stopped due to",
+    "Agent stopped after reaching the maximum number of steps",
+    "No output generated",
+)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", query.lower())).strip()
+
+
+def is_complete_answer(response: str) -> bool:
+    return bool(response) and not response.lstrip().startswith(INCOMPLETE_ANSWER_PREFIXES)
+
+
+def cache_namespace(profile: str, user_id: str | None) -> str:
+    """Entries are per profile and user: the system prompt carries the user's own context."""
+    return f"{profile}\n{user_id or ''}"
+
+
+@dataclass
+class CacheHit:
+    query: str
+    response: str
+    score: float
+
+
+class ResponseCacheBackend:
+    """Storage for cached answers. Vectors are L2-normalized float32 arrays."""
+
+    async def lookup(self, namespace: str, vector: np.ndarray, threshold: float) -> CacheHit | None:
+        raise NotImplementedError
+
+    async def store(self, namespace: str, query: str, vector: np.ndarray, response: str) -> None:
+        raise NotImplementedError
+
+    async def clear(self, namespace: str | None = None) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InMemoryResponseBackend(ResponseCacheBackend):
+    """Per-namespace LRU + TTL store searched with one matrix-vector product."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # (namespace, normalized query) -> (created_at, vector, query, response)
+        self._entries: OrderedDict[tuple[str, str], tuple[float, np.ndarray, str, str]] = OrderedDict()
+        self._matrices: dict[str, tuple[list[tuple[str, str]], np.ndarray]] = {}
+        self.evictions = 0
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if now - entry[0] > self.ttl]
+        for key in expired:
+            del self._entries[key]
+            self._matrices.pop(key[0], None)
+            self.evictions += 1
+
+    def _matrix(self, namespace: str) -> tuple[list[tuple[str, str]], np.ndarray] | None:
+        cached = self._matrices.get(namespace)
+        if cached is None:
+            keys = [key for key in self._entries if key[0] == namespace]
+            if not keys:
+                return None
+            cached = (keys, np.stack([self._entries[key][1] for key in keys]))
+            self._matrices[namespace] = cached
+        return cached
+
+    async def lookup(self, namespace: str, vector: np.ndarray, threshold: float) -> CacheHit | None:
+        self._expire()
+        matrix = self._matrix(namespace)
+        if matrix is None:
+            return None
+        keys, vectors = matrix
+        scores = vectors @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < threshold:
+            return None
+        key = keys[best]
+        self._entries.move_to_end(key)
+        _, _, query, response = self._entries[key]
+        return CacheHit(query=query, response=response, score=float(scores[best]))
+
+    async def store(self, namespace: str, query: str, vector: np.ndarray, response: str) -> None:
+        key = (namespace, normalize_query(query))
+        self._entries[key] = (time.monotonic(), vector, query, response)
+        self._entries.move_to_end(key)
+        self._matrices.pop(namespace, None)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._matrices.pop(evicted[0], None)
+            self.evictions += 1
+
+    async def clear(self, namespace: str | None = None) -> None:
+        if namespace is None:
+            self._entries.clear()
+            self._matrices.clear()
+            return
+        for key in [key for key in self._entries if key[0] == namespace]:
+            del self._entries[key]
+        self._matrices.pop(namespace, None)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "evictions": self.evictions}
+
+
+def load_backend(spec: str = RESPONSE_CACHE_BACKEND) -> ResponseCacheBackend:
+    if spec == "memory":
+        return InMemoryResponseBackend()
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"RESPONSE_CACHE_BACKEND must be 'memory' or 'module:ClassName', got '{spec}'")
+    backend = getattr(importlib.import_module(module_name), class_name)()
+    if not isinstance(backend, ResponseCacheBackend):
+        raise TypeError(f"{spec} is not a ResponseCacheBackend")
+    return backend
+
+
+class ResponseCache:
+    """
+    Opt-in semantic cache of final answers, keyed by cache_namespace() and the
+    embedding of the normalized query. Answers that used user-specific tools are
+    never stored, and neither are failed runs (see INCOMPLETE_ANSWER_PREFIXES).
+    A None namespace (e.g. a conversation that already has history, whose answer
+    may depend on earlier turns) skips both lookup and store.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = RESPONSE_CACHE_ENABLED,
+        backend: ResponseCacheBackend | None = None,
+        threshold: float = RESPONSE_CACHE_THRESHOLD,
+        safe_servers: set[str] = RESPONSE_CACHE_SAFE_SERVERS,
+    ):
+        self.enabled = enabled
+        self.backend = backend if backend is not None else (load_backend() if enabled else None)
+        self.threshold = threshold
+        self.safe_servers = safe_servers
+        self._embeddings = None
+        self.metrics = {"hits": 0, "misses": 0, "stores": 0, "bypassed": 0, "errors": 0}
+
+    def _embedder(self) -> GoogleGenerativeAIEmbeddings:
+        if self._embeddings is None:
+            self._embeddings = GoogleGenerativeAIEmbeddings(
+                model=RESPONSE_CACHE_EMBEDDING_MODEL,
+                google_api_key=os.getenv("GOOGLE_API_KEY"),
+            )
+        return self._embeddings
+
+    async def _embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(await self._embedder().aembed_query(normalize_query(query)), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    async def lookup(self, namespace: str | None, query: str) -> tuple[CacheHit | None, np.ndarray | None]:
+        if not self.enabled:
+            return None, None
+        if namespace is None:
+            self.metrics["bypassed"] += 1
+            return None, None
+        try:
+            vector = await self._embed(query)
+            hit = await self.backend.lookup(namespace, vector, self.threshold)
+        except Exception as e:
+            self.metrics["errors"] += 1
+            logger.warning(f"Response cache lookup failed: {e}")
+            return None, None
+        self.metrics["hits" if hit else "misses"] += 1
+        return hit, vector
+
+    async def store(
+        self, namespace: str | None, query: str, vector: np.ndarray | None, response: str, servers_used: set[str]
+    ) -> bool:
+        if not self.enabled or namespace is None or vector is None or not response:
+            return False
+        if not servers_used or not servers_used <= self.safe_servers or not is_complete_answer(response):
+            self.metrics["bypassed"] += 1
+            return False
+        try:
+            await self.backend.store(namespace, query, vector, response)
+        except Exception as e:
+            self.metrics["errors"] += 1
+            logger.warning(f"Response cache store failed: {e}")
+            return False
+        self.metrics["stores"] += 1
+        return True
+
+    def stats(self) -> dict:
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            "enabled": self.enabled,
+            "hit_rate": self.metrics["hits"] / lookups if lookups else 0.0,
+            **self.metrics,
+            **(self.backend.stats() if self.backend else {}),
+        }
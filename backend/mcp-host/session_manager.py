@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from mcp_use import MCPAgent, MCPClient
+
+logger = logging.getLogger("mcp-host.sessions")
+
+# Config
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "500"))
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800"))
+SESSION_MEMORY_BUDGET_MB = float(os.getenv("SESSION_MEMORY_BUDGET_MB", "512"))
+SESSION_SWEEP_INTERVAL_SECONDS = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "60"))
+
+# Rough fixed cost of one agent (executor, tool wrappers, client bookkeeping)
+# on top of its conversation history. Used only for the memory budget.
+AGENT_BASE_BYTES = 256 * 1024
+
+
+@dataclass
+class SessionEntry:
+    agents: dict[str, MCPAgent] = field(default_factory=dict)
+    clients: dict[str, MCPClient] = field(default_factory=dict)
+    # user_id each profile's agent was built for (its system prompt carries that user's context)
+    user_ids: dict[str, str | None] = field(default_factory=dict)
+    active_profile: str | None = None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    running: asyncio.Task | None = None
+    created_at: float = field(default_factory=time.monotonic)
+    last_access: float = field(default_factory=time.monotonic)
+
+    def estimated_bytes(self) -> int:
+        total = 0
+        for agent in self.agents.values():
+            total += AGENT_BASE_BYTES
+            try:
+                history = agent.get_conversation_history()
+            except Exception:
+                continue
+            total += sum(len(str(getattr(message, "content", ""))) for message in history)
+        return total
+
+
+class SessionManager:
+    """
+    Holds per-cookie agents and MCP clients with LRU + idle-TTL eviction.
+    Evicted sessions have their MCP clients closed in the background.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        idle_ttl: float = SESSION_IDLE_TTL_SECONDS,
+        memory_budget_bytes: int = int(SESSION_MEMORY_BUDGET_MB * 1024 * 1024),
+        sweep_interval: float = SESSION_SWEEP_INTERVAL_SECONDS,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.memory_budget_bytes = memory_budget_bytes
+        self.sweep_interval = sweep_interval
+        self._sessions: OrderedDict[str, SessionEntry] = OrderedDict()
+        self._closing: set[asyncio.Task] = set()
+        self._sweeper: asyncio.Task | None = None
+        self.metrics = {
+            "sessions_created": 0,
+            "evictions_lru": 0,
+            "evictions_ttl": 0,
+            "evictions_memory": 0,
+            "sessions_cleared": 0,
+            "client_close_errors": 0,
+        }
+
+    # --- Lookup ---
+
+    def get(self, session_id: str | None) -> SessionEntry | None:
+        if not session_id:
+            return None
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        if self._is_expired(entry, time.monotonic()):
+            self._evict(session_id, "evictions_ttl")
+            return None
+        entry.last_access = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return entry
+
+    def get_agent(self, session_id: str, profile_name: str) -> MCPAgent | None:
+        entry = self.get(session_id)
+        return entry.agents.get(profile_name) if entry else None
+
+    def get_active_agent(self, session_id: str | None) -> tuple[str, MCPAgent] | None:
+        entry = self.get(session_id)
+        if not entry or not entry.active_profile:
+            return None
+        agent = entry.agents.get(entry.active_profile)
+        return (entry.active_profile, agent) if agent else None
+
+    # --- Mutation ---
+
+    def set_active_profile(self, session_id: str, profile_name: str) -> None:
+        entry = self.get(session_id)
+        if entry:
+            entry.active_profile = profile_name
+
+    def put_agent(
+        self, session_id: str, profile_name: str, agent: MCPAgent, client: MCPClient, user_id: str | None = None
+    ) -> None:
+        entry = self.get(session_id)
+        if entry is None:
+            entry = SessionEntry()
+            self._sessions[session_id] = entry
+            self.metrics["sessions_created"] += 1
+
+        previous = entry.clients.get(profile_name)
+        if previous is not None and previous is not client:
+            self._close_clients([previous])
+
+        entry.agents[profile_name] = agent
+        entry.clients[profile_name] = client
+        entry.user_ids[profile_name] = user_id
+        entry.active_profile = profile_name
+        self._enforce_limits()
+
+    async def remove(self, session_id: str) -> bool:
+        entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return False
+        self.metrics["sessions_cleared"] += 1
+        await self._close_entry(entry)
+        return True
+
+    # --- Eviction ---
+
+    def _is_expired(self, entry: SessionEntry, now: float) -> bool:
+        return self.idle_ttl > 0 and now - entry.last_access > self.idle_ttl
+
+    def _evict(self, session_id: str, reason: str) -> None:
+        entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return
+        self.metrics[reason] += 1
+        logger.info(f"Evicting session {session_id} ({reason})")
+        self._close_clients(entry.clients.values())
+
+    def _enforce_limits(self) -> None:
+        while len(self._sessions) > self.max_sessions:
+            session_id = next(iter(self._sessions))
+            self._evict(session_id, "evictions_lru")
+
+        if self.memory_budget_bytes <= 0:
+            return
+        total = self.estimated_bytes()
+        # Always keep the most recently used session, even if it alone is over budget.
+        while total > self.memory_budget_bytes and len(self._sessions) > 1:
+            session_id, entry = next(iter(self._sessions.items()))
+            total -= entry.estimated_bytes()
+            self._evict(session_id, "evictions_memory")
+
+    def sweep(self) -> None:
+        now = time.monotonic()
+        expired = [sid for sid, entry in self._sessions.items() if self._is_expired(entry, now)]
+        for session_id in expired:
+            self._evict(session_id, "evictions_ttl")
+        self._enforce_limits()
+
+    def estimated_bytes(self) -> int:
+        return sum(entry.estimated_bytes() for entry in self._sessions.values())
+
+    # --- Client shutdown ---
+
+    async def _close_entry(self, entry: SessionEntry) -> None:
+        for client in entry.clients.values():
+            await self._close_client(client)
+
+    async def _close_client(self, client: MCPClient) -> None:
+        try:
+            await client.close_all_sessions()
+        except Exception as e:
+            self.metrics["client_close_errors"] += 1
+            logger.warning(f"Error while closing MCP client: {e}")
+
+    def _close_clients(self, clients) -> None:
+        for client in list(clients):
+            task = asyncio.get_running_loop().create_task(self._close_client(client))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    # --- Lifecycle ---
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Session sweep failed: {e}", exc_info=True)
+
+    def start(self) -> None:
+        if self._sweeper is None and self.sweep_interval > 0:
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_loop())
+
+    async def shutdown(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        entries = list(self._sessions.values())
+        self._sessions.clear()
+        for entry in entries:
+            await self._close_entry(entry)
+        if self._closing:
+            await asyncio.gather(*self._closing, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "live_sessions": len(self._sessions),
+            "live_agents": sum(len(entry.agents) for entry in self._sessions.values()),
+            "estimated_bytes": self.estimated_bytes(),
+            "memory_budget_bytes": self.memory_budget_bytes,
+            **self.metrics,
+        }
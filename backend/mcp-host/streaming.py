@@ -0,0 +1,145 @@
+import asyncio
+import json
+import logging
+import os
+from contextlib import aclosing
+from typing import AsyncIterator
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from langchain_core.messages import AIMessage
+from mcp_use import MCPAgent
+
+logger = logging.getLogger("mcp-host.streaming")
+
+# Config
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "64"))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+STREAM_TOOL_OUTPUT_CHARS = int(os.getenv("STREAM_TOOL_OUTPUT_CHARS", "2000"))
+
+_DONE = object()
+
+
+def _chunk_text(chunk) -> str:
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part) for part in content
+        )
+    return ""
+
+
+def _final_output(event: dict) -> str | None:
+    if event.get("event") != "on_chain_end" or event.get("parent_ids"):
+        return None
+    output = event.get("data", {}).get("output")
+    if isinstance(output, dict) and isinstance(output.get("output"), str):
+        return output["output"]
+    return None
+
+
+async def agent_events(agent: MCPAgent, query: str, max_steps: int = 10) -> AsyncIterator[dict]:
+    """
+    Translate the agent's LangChain event stream into client events:
+    token, tool_start, tool_end and a single final event.
+    """
+    stream = getattr(agent, "stream_events", None) or agent.astream
+    final = None
+    tokens: list[str] = []
+
+    async with aclosing(stream(query, max_steps=max_steps)) as agent_stream:
+        async for event in agent_stream:
+            if isinstance(event, str):
+                tokens.append(event)
+                yield {"type": "token", "text": event}
+                continue
+
+            kind = event.get("event")
+            if kind == "on_chat_model_stream":
+                text = _chunk_text(event.get("data", {}).get("chunk"))
+                if text:
+                    tokens.append(text)
+                    yield {"type": "token", "text": text}
+            elif kind == "on_tool_start":
+                tokens.clear()
+                yield {"type": "tool_start", "name": event.get("name"), "input": event.get("data", {}).get("input")}
+            elif kind == "on_tool_end":
+                output = _chunk_text(event.get("data", {}).get("output"))
+                yield {"type": "tool_end", "name": event.get("name"), "output": output[:STREAM_TOOL_OUTPUT_CHARS]}
+            else:
+                final = _final_output(event) or final
+
+    # Without the executor's own output the run did not finish cleanly; the tokens are a best effort
+    complete = final is not None
+    final = final if complete else "".join(tokens)
+
+    # Keep memory in line with the blocking /ask path.
+    if agent.memory_enabled and final:
+        history = agent.get_conversation_history()
+        if not (history and isinstance(history[-1], AIMessage) and history[-1].content == final):
+            agent.add_to_history(AIMessage(content=final))
+
+    yield {"type": "final", "response": final, "complete": complete}
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def sse_response(request: Request, events: AsyncIterator[dict]) -> StreamingResponse:
+    """
+    Serve events as text/event-stream. A bounded queue between the agent and the
+    socket applies backpressure, and a client disconnect cancels the agent run.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+
+    async def produce():
+        try:
+            async for event in events:
+                await queue.put(event)
+        except Exception as e:
+            logger.error(f"Streaming agent run failed: {e}", exc_info=True)
+            await queue.put({"type": "error", "error": str(e)})
+        finally:
+            # Close the generator in this task so its locks and timeouts unwind here.
+            await events.aclose()
+        await queue.put(_DONE)
+
+    async def body():
+        producer = asyncio.create_task(produce())
+        getter = None
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait(
+                    {getter, producer}, timeout=STREAM_HEARTBEAT_SECONDS, return_when=asyncio.FIRST_COMPLETED
+                )
+                if getter not in done:
+                    getter.cancel()
+                    if producer.done():
+                        # The producer always enqueues _DONE unless it was cancelled.
+                        yield _sse({"type": "error", "error": "Request was cancelled."})
+                        break
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                event = getter.result()
+                if event is _DONE:
+                    break
+                yield _sse(event)
+        finally:
+            if getter is not None and not getter.done():
+                getter.cancel()
+            if not producer.done():
+                logger.info("Client disconnected, cancelling agent run")
+                producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from connection_pool import ConnectionPool
+
+logger = logging.getLogger("mcp-host.user_context")
+
+# Config
+USER_CONTEXT_TTL_SECONDS = float(os.getenv("USER_CONTEXT_TTL_SECONDS", "900"))
+USER_CONTEXT_MAX_ENTRIES = int(os.getenv("USER_CONTEXT_MAX_ENTRIES", "5000"))
+
+
+def _result_text(result) -> str:
+    content = getattr(result, "content", None)
+    if not content:
+        return str(result)
+    return "\n".join(getattr(item, "text", "") for item in content if hasattr(item, "text"))
+
+
+class UserContextCache:
+    """
+    Employee details per user_id, fetched over the pooled employee session.
+    Concurrent lookups for the same user share one in-flight call.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        server_name: str,
+        server_config: dict,
+        ttl: float = USER_CONTEXT_TTL_SECONDS,
+        max_entries: int = USER_CONTEXT_MAX_ENTRIES,
+    ):
+        self.pool = pool
+        self.server_name = server_name
+        self.server_config = server_config
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self.metrics = {"hits": 0, "misses": 0, "errors": 0}
+
+    async def _fetch(self, user_id: str) -> str:
+        session = await self.pool.session(self.server_name, self.server_config)
+        result = await session.connector.call_tool("Get_Employee_Details", {"id": user_id})
+        if getattr(result, "isError", False):
+            raise RuntimeError(_result_text(result))
+        return _result_text(result)
+
+    async def get(self, user_id: str) -> str:
+        cached = self._entries.get(user_id)
+        if cached and time.monotonic() - cached[0] < self.ttl:
+            self._entries.move_to_end(user_id)
+            self.metrics["hits"] += 1
+            return cached[1]
+
+        future = self._in_flight.get(user_id)
+        if future is None:
+            self.metrics["misses"] += 1
+            future = asyncio.ensure_future(self._fetch(user_id))
+            self._in_flight[user_id] = future
+            try:
+                details = await future
+            except Exception:
+                self.metrics["errors"] += 1
+                raise
+            finally:
+                self._in_flight.pop(user_id, None)
+            self._entries[user_id] = (time.monotonic(), details)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return details
+
+        self.metrics["hits"] += 1
+        return await asyncio.shield(future)
+
+    def invalidate(self, user_id: str) -> None:
+        self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "in_flight": len(self._in_flight), **self.metrics}
@@ -0,0 +1,157 @@
+"""
+HTTP delivery of stored artifacts, served next to the docgeneration SSE endpoint.
+
+    GET|HEAD /artifacts/{key}/{filename}?expires=<unix time>&sig=<hmac>
+
+Links are signed with ARTIFACT_SIGNING_KEY (HMAC-SHA256 over key, filename
+and expiry) and stop working after ARTIFACT_URL_TTL_SECONDS. Responses carry
+a strong ETag (the artifact key, which fixes the content), honour
+If-None-Match and single byte-range requests. Whole files go out through
+Starlette's FileResponse, which uses the server's zero-copy path when it has
+one; with ARTIFACT_ACCEL_REDIRECT_PREFIX set, a fronting nginx serves the
+file itself via X-Accel-Redirect and sendfile.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+import mimetypes
+import os
+import secrets
+import time
+from urllib.parse import quote
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+
+from artifact_store import Artifact, ArtifactStore
+
+logger = logging.getLogger("GenerateDocuments.artifact_server")
+
+# Config
+ARTIFACT_SIGNING_KEY = os.getenv("ARTIFACT_SIGNING_KEY", "")
+ARTIFACT_URL_TTL_SECONDS = int(os.getenv("ARTIFACT_URL_TTL_SECONDS", "86400"))
+# Base URL clients reach this server on, e.g. https://docgeneration.onrender.com
+ARTIFACT_PUBLIC_BASE_URL = os.getenv("ARTIFACT_PUBLIC_BASE_URL", "")
+# nginx internal location mapped to ARTIFACT_DIR, e.g. /protected-artifacts/
+ARTIFACT_ACCEL_REDIRECT_PREFIX = os.getenv("ARTIFACT_ACCEL_REDIRECT_PREFIX", "")
+
+ROUTE = "/artifacts/{key}/{filename}"
+READ_CHUNK_BYTES = 256 * 1024
+
+
+class RangeNotSatisfiable(ValueError):
+    pass
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """(start, end) inclusive for a single "bytes=" range; None means serve the whole file."""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None  # multi-range requests fall through to FileResponse (multipart or the full body)
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable(header)
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise RangeNotSatisfiable(header)
+    return start, end
+
+
+async def _read_range(path: str, start: int, end: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(READ_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class ArtifactServer:
+    def __init__(self, store: ArtifactStore, base_url: str = ARTIFACT_PUBLIC_BASE_URL,
+                 signing_key: str = ARTIFACT_SIGNING_KEY, ttl_seconds: int = ARTIFACT_URL_TTL_SECONDS):
+        self.store = store
+        self.base_url = base_url.rstrip("/")
+        self.ttl_seconds = ttl_seconds
+        if not signing_key:
+            logger.warning("ARTIFACT_SIGNING_KEY is not set; download links only work until this process restarts")
+            signing_key = secrets.token_hex(32)
+        self._key = signing_key.encode("utf-8")
+
+    def _signature(self, key: str, filename: str, expires: int) -> str:
+        digest = hmac.new(self._key, f"{key}/{filename}:{expires}".encode("utf-8"), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+    def url(self, artifact: Artifact, ttl_seconds: int | None = None) -> str:
+        """Signed download link for artifact, valid for ttl_seconds."""
+        expires = int(time.time()) + (ttl_seconds or self.ttl_seconds)
+        signature = self._signature(artifact.key, artifact.filename, expires)
+        path = ROUTE.format(key=artifact.key, filename=quote(artifact.filename))
+        return f"{self.base_url}{path}?expires={expires}&sig={signature}"
+
+    def _verify(self, key: str, filename: str, expires: str, signature: str) -> bool:
+        try:
+            expires_at = int(expires)
+        except ValueError:
+            return False
+        if expires_at < time.time():
+            return False
+        return hmac.compare_digest(self._signature(key, filename, expires_at), signature)
+
+    async def handle(self, request: Request) -> Response:
+        key = request.path_params["key"]
+        filename = request.path_params["filename"]
+        if not self._verify(key, filename, request.query_params.get("expires", ""), request.query_params.get("sig", "")):
+            return PlainTextResponse("Download link is invalid or has expired.", status_code=403)
+
+        artifact = await asyncio.to_thread(self.store.get, key)
+        if artifact is None or artifact.filename != filename:
+            return PlainTextResponse("Document no longer available; generate it again.", status_code=404)
+
+        etag = f'"{artifact.key}"'
+        media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        headers = {
+            "ETag": etag,
+            "Accept-Ranges": "bytes",
+            "Cache-Control": "private, max-age=86400, immutable",
+            "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]):
+            return Response(status_code=304, headers=headers)
+
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+        if range_header and (not if_range or if_range.strip() == etag):
+            try:
+                byte_range = parse_range(range_header, artifact.size)
+            except RangeNotSatisfiable:
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{artifact.size}"})
+            if byte_range is not None:
+                start, end = byte_range
+                headers["Content-Range"] = f"bytes {start}-{end}/{artifact.size}"
+                headers["Content-Length"] = str(end - start + 1)
+                if request.method == "HEAD":
+                    return Response(status_code=206, headers=headers, media_type=media_type)
+                return StreamingResponse(_read_range(artifact.path, start, end), status_code=206,
+                                         headers=headers, media_type=media_type)
+
+        if ARTIFACT_ACCEL_REDIRECT_PREFIX:
+            relative = os.path.relpath(artifact.path, self.store.root).replace(os.sep, "/")
+            headers["X-Accel-Redirect"] = ARTIFACT_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(relative)
+            return Response(headers=headers, media_type=media_type)
+        return FileResponse(artifact.path, headers=headers, media_type=media_type)
@@ -0,0 +1,168 @@
+"""
+Content-addressed store for generated documents.
+
+Each artifact lives at <ARTIFACT_DIR>/<key[:2]>/<key>/<filename>, where key is
+the hash of the generation input, and is recorded in an SQLite index
+(WAL mode, so several server processes can share one directory). Hits are
+checked against the filesystem; eviction removes artifacts older than
+ARTIFACT_MAX_AGE_SECONDS, then least recently used ones until the store fits
+in ARTIFACT_MAX_MB.
+"""
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger("GenerateDocuments.artifact_store")
+
+# Config
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR") or os.path.join(BACKEND_DIR, "data", "artifacts")
+ARTIFACT_MAX_BYTES = int(float(os.getenv("ARTIFACT_MAX_MB", "2048")) * 1024 * 1024)
+ARTIFACT_MAX_AGE_SECONDS = int(os.getenv("ARTIFACT_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+
+INDEX_FILE = "index.sqlite3"
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artifacts_last_access ON artifacts (last_access);
+"""
+
+
+@dataclass
+class Artifact:
+    key: str
+    kind: str
+    filename: str
+    path: str
+    size: int
+    created_at: float
+    last_access: float
+
+
+class ArtifactStore:
+    def __init__(self, root: str = ARTIFACT_DIR, max_bytes: int = ARTIFACT_MAX_BYTES,
+                 max_age_seconds: int = ARTIFACT_MAX_AGE_SECONDS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._tmp_root = os.path.join(root, "tmp")
+        os.makedirs(self._tmp_root, exist_ok=True)
+        self._local = threading.local()
+        with self._db() as db:
+            db.executescript(_SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers in other processes proceed during writes
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(os.path.join(self.root, INDEX_FILE), timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def path_for(self, key: str, filename: str) -> str:
+        return os.path.join(self.root, key[:2], key, filename)
+
+    def _artifact(self, row) -> Artifact:
+        key, kind, filename, size, created_at, last_access = row
+        return Artifact(key, kind, filename, self.path_for(key, filename), size, created_at, last_access)
+
+    # --- Lookup ---
+
+    def get(self, key: str) -> Artifact | None:
+        """The stored artifact, or None if it is unknown or its file has gone."""
+        with self._db() as db:
+            row = db.execute(
+                "SELECT key, kind, filename, size, created_at, last_access FROM artifacts WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            artifact = self._artifact(row)
+            if not os.path.isfile(artifact.path):
+                logger.info(f"Artifact {key[:12]} missing on disk, dropping it from the index")
+                self._delete(db, key)
+                return None
+            artifact.last_access = time.time()
+            db.execute("UPDATE artifacts SET last_access = ? WHERE key = ?", (artifact.last_access, key))
+        return artifact
+
+    # --- Writes ---
+
+    def reserve(self, filename: str) -> str:
+        """A fresh scratch path to render filename into; pass it to commit() or discard()."""
+        return os.path.join(tempfile.mkdtemp(dir=self._tmp_root), filename)
+
+    def commit(self, key: str, kind: str, filename: str, scratch_path: str) -> Artifact:
+        """Move a rendered scratch file into place atomically and index it."""
+        path = self.path_for(key, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(scratch_path, path)
+
+        now = time.time()
+        size = os.path.getsize(path)
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO artifacts (key, kind, filename, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, filename, size, now, now),
+            )
+        logger.info(f"Stored {kind} artifact {key[:12]} ({size} bytes) as {filename}")
+        self.evict()
+        return Artifact(key, kind, filename, path, size, now, now)
+
+    def discard(self, scratch_path: str) -> None:
+        shutil.rmtree(os.path.dirname(scratch_path), ignore_errors=True)
+
+    def _delete(self, db: sqlite3.Connection, key: str) -> None:
+        db.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+        shutil.rmtree(os.path.join(self.root, key[:2], key), ignore_errors=True)
+        try:
+            os.rmdir(os.path.join(self.root, key[:2]))
+        except OSError:
+            pass  # still holds other artifacts
+
+    def evict(self) -> int:
+        """Drop expired artifacts, then the least recently used until under max_bytes."""
+        evicted = 0
+        with self._db() as db:
+            cutoff = time.time() - self.max_age_seconds
+            for (key,) in db.execute("SELECT key FROM artifacts WHERE created_at < ?", (cutoff,)).fetchall():
+                self._delete(db, key)
+                evicted += 1
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+            if total > self.max_bytes:
+                for key, size in db.execute("SELECT key, size FROM artifacts ORDER BY last_access").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    self._delete(db, key)
+                    total -= size
+                    evicted += 1
+        if evicted:
+            logger.info(f"Evicted {evicted} artifacts")
+        return evicted
+
+    def clear(self) -> int:
+        """Delete every artifact; returns how many were removed."""
+        with self._db() as db:
+            keys = [key for (key,) in db.execute("SELECT key FROM artifacts").fetchall()]
+            for key in keys:
+                self._delete(db, key)
+        return len(keys)
+
+    def stats(self) -> dict:
+        with self._db() as db:
+            count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        return {"artifacts": count, "bytes": total, "max_bytes": self.max_bytes}
+
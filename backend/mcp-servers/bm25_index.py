@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter
+
+import numpy as np
+
+logger = logging.getLogger("DocIngestorAndRetrieval.bm25_index")
+
+# Config
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Full reload from the documents table, to pick up ingests run outside this server;
+# this server's own ingest jobs are applied incrementally with update_files()
+BM25_REFRESH_SECONDS = float(os.getenv("BM25_REFRESH_SECONDS", "3600"))
+
+# Keeps clause numbers and codes ("4.2.1", "hr-07") as single terms
+_TOKEN = re.compile(r"\w+(?:[./-]\w+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do for from has have how i in is it its of on or "
+    "that the their this to was what when where which who will with".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        terms.append(token)
+        if not token.isalnum():
+            # "4.2.1" also matches a query for "4", "sick-leave" one for "leave"
+            terms.extend(part for part in re.split(r"[./-]", token) if part and part not in _STOPWORDS)
+    return terms
+
+
+class BM25Index:
+    """
+    Okapi BM25 over chunk records ({"id", "content", "metadata"}). Postings are
+    appended incrementally and compiled to NumPy arrays on first use.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.records: list[dict] = []
+        self._lengths: list[int] = []
+        self._postings: dict[str, list[tuple[int, int]]] = {}
+        self._compiled: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self._doc_lengths = np.zeros(0, dtype=np.float32)
+        self.loaded_at: float | None = None
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def add(self, records) -> None:
+        for record in records:
+            row = len(self.records)
+            terms = Counter(tokenize(record.get("content", "")))
+            self.records.append(record)
+            self._lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self._postings.setdefault(term, []).append((row, tf))
+                self._compiled.pop(term, None)
+        self._doc_lengths = np.asarray(self._lengths, dtype=np.float32)
+
+    def idf(self, term: str) -> float:
+        count = len(self.records)
+        df = len(self._postings.get(term, ()))
+        return math.log(1 + (count - df + 0.5) / (df + 0.5))
+
+    def _posting(self, term: str) -> tuple[np.ndarray, np.ndarray] | None:
+        compiled = self._compiled.get(term)
+        if compiled is None:
+            posting = self._postings.get(term)
+            if not posting:
+                return None
+            rows, tfs = zip(*posting)
+            compiled = (np.asarray(rows, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+            self._compiled[term] = compiled
+        return compiled
+
+    def search(self, query: str, k: int = 5) -> list[tuple[dict, float]]:
+        """Top-k (record, score) pairs; records without any query term are never returned."""
+        count = len(self.records)
+        if not count or k <= 0:
+            return []
+        scores = np.zeros(count, dtype=np.float32)
+        matched = np.zeros(count, dtype=bool)
+        norm = self.k1 * (1 - self.b + self.b * self._doc_lengths / max(float(self._doc_lengths.mean()), 1.0))
+        for term in set(tokenize(query)):
+            posting = self._posting(term)
+            if posting is None:
+                continue
+            rows, tfs = posting
+            idf = math.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm[rows])
+            matched[rows] = True
+
+        candidates = np.flatnonzero(matched)
+        if not len(candidates):
+            return []
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(self.records[int(row)], float(scores[row])) for row in candidates]
+
+    # --- Loading ---
+
+    def _built(self, records) -> "BM25Index":
+        fresh = BM25Index(self.k1, self.b)
+        fresh.add(records)
+        return fresh
+
+    def _adopt(self, fresh: "BM25Index") -> None:
+        self.records, self._lengths, self._postings = fresh.records, fresh._lengths, fresh._postings
+        self._compiled, self._doc_lengths = {}, fresh._doc_lengths
+        self.loaded_at = time.monotonic()
+        logger.info(f"BM25 index built over {len(self)} chunks.")
+
+    def replace(self, records) -> None:
+        self._adopt(self._built(records))
+
+    async def areplace(self, records) -> None:
+        """replace() with the build done off the event loop."""
+        self._adopt(await asyncio.to_thread(self._built, records))
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > BM25_REFRESH_SECONDS
+
+    @staticmethod
+    async def _fetch(store, source_files: list[str] | None = None, page_size: int = 1000) -> list[dict]:
+        """Chunk records from the documents table, all of them or only those of source_files."""
+        records = []
+        start = 0
+        while True:
+            table = await store.table()
+            query = table.select("id, content, metadata")
+            if source_files is not None:
+                query = query.in_("metadata->>source_file", source_files)
+            response = await query.order("id").range(start, start + page_size - 1).execute()
+            rows = response.data or []
+            records.extend(
+                {"id": str(row["id"]), "content": row["content"], "metadata": row.get("metadata") or {}}
+                for row in rows
+            )
+            if len(rows) < page_size:
+                break
+            start += page_size
+        return records
+
+    async def refresh(self, store, page_size: int = 1000) -> None:
+        """Rebuild from every chunk in the documents table."""
+        async with self._refresh_lock:
+            records = await self._fetch(store, page_size=page_size)
+            # Built off the event loop, swapped in on it so searches never see a half-built index
+            await self.areplace(records)
+
+    async def update_files(self, store, changed=(), removed=()) -> None:
+        """
+        Apply an ingest: drop the chunks of changed and removed files and fetch only
+        the changed files' chunks again. An index that was never loaded is left for
+        the first full refresh.
+        """
+        changed, removed = set(changed), set(removed)
+        if self.loaded_at is None or not (changed or removed):
+            return
+        async with self._refresh_lock:
+            try:
+                fetched = await self._fetch(store, sorted(changed)) if changed else []
+            except Exception:
+                self.loaded_at = -math.inf  # fall back to a full reload on the next search
+                raise
+            dropped = changed | removed
+            kept = [r for r in self.records if r.get("metadata", {}).get("source_file") not in dropped]
+            loaded_at = self.loaded_at
+            await self.areplace(kept + fetched)
+            # Still due for the periodic full reload
+            self.loaded_at = loaded_at
+
+    def refresh_in_background(self, store) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh(store))
@@ -0,0 +1,89 @@
+"""
+Certificates per second: one PDF per call versus the batch renderer.
+
+    python certificate_benchmark.py --count 500 --workers 4
+
+  per-call   write_certificate_pdf once per person, as Generate_Bonafide_Certificate_PDF does
+  batch      write_certificate_batch in one process (static layers drawn once as form XObjects)
+  parallel   the batch split across --workers processes, then merged
+
+The batch tool splits zip output across workers but renders a merged PDF in
+one worker, because re-merging PDF parts with pypdf costs about as much as
+rendering them; this benchmark shows that trade-off on the current machine.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from doc_renderers import merge_certificate_parts, write_certificate_batch, write_certificate_pdf
+
+VALID_TILL = "31-12-2026"
+
+
+def sample_certificates(count: int) -> list[dict]:
+    return [
+        {
+            "student_name": f"Employee Number {i}",
+            "program_name": "visa application",
+            "issue_date": "01-12-2026",
+            "certificate_id": f"ORION-20261201-{i:06d}",
+        }
+        for i in range(count)
+    ]
+
+
+def per_call(certificates: list[dict], out_dir: str, output: str) -> str:
+    paths = []
+    for i, data in enumerate(certificates):
+        paths.append(os.path.join(out_dir, f"single_{i}.pdf"))
+        write_certificate_pdf(data, VALID_TILL, paths[-1])
+    return paths[0]
+
+
+def batch(certificates: list[dict], out_dir: str, output: str) -> str:
+    path = os.path.join(out_dir, f"batch.{output}")
+    write_certificate_batch(certificates, VALID_TILL, output, path)
+    return path
+
+
+def parallel(certificates: list[dict], out_dir: str, output: str, workers: int) -> str:
+    per_part = -(-len(certificates) // workers)
+    chunks = [certificates[i:i + per_part] for i in range(0, len(certificates), per_part)]
+    parts = [os.path.join(out_dir, f"part{i}.{output}") for i in range(len(chunks))]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(write_certificate_batch, chunks, [VALID_TILL] * len(chunks), [output] * len(chunks), parts))
+    path = os.path.join(out_dir, f"parallel.{output}")
+    merge_certificate_parts(parts, output, path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark certificate generation throughput")
+    parser.add_argument("--count", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--output", choices=["pdf", "zip"], default="pdf")
+    args = parser.parse_args()
+
+    certificates = sample_certificates(args.count)
+    runs = [
+        ("per-call", per_call),
+        ("batch", batch),
+        (f"parallel x{args.workers}", lambda c, d, o: parallel(c, d, o, args.workers)),
+    ]
+    print(f"📄 {args.count} certificates, output={args.output}")
+    baseline = None
+    for name, run in runs:
+        out_dir = tempfile.mkdtemp(prefix="certbench_")
+        try:
+            started = time.perf_counter()
+            path = run(certificates, out_dir, args.output)
+            elapsed = time.perf_counter() - started
+            size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir) if not f.startswith("part"))
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+        rate = args.count / elapsed
+        baseline = baseline or rate
+        print(f"{name:<14}{elapsed:>8.2f}s {rate:>9.1f} certs/s {rate / baseline:>6.1f}x {size / 1024:>9.0f} KiB")
@@ -0,0 +1,224 @@
+"""
+Structure-preserving chunker for policy PDFs.
+
+Per document it:
+  1. drops boilerplate lines (headers, footers, page numbers) that repeat at
+     the top or bottom of most pages, digits ignored so "Page 3 of 9" matches;
+  2. splits the text into blocks at headings (numbered clauses, "Section 4",
+     ALL-CAPS titles) and blank lines, tracking the heading hierarchy;
+  3. packs whole blocks into chunks of up to CHUNK_TOKENS model tokens without
+     crossing a section boundary, splitting oversized blocks at sentences.
+
+Chunks carry `section` / `section_path` and the page span they cover.
+Token counts use tiktoken when installed, otherwise a words-based estimate.
+"""
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+
+# Config
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "350"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+BOILERPLATE_MIN_FRACTION = float(os.getenv("BOILERPLATE_MIN_FRACTION", "0.5"))
+BOILERPLATE_EDGE_LINES = 3
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # optional; the estimate is within ~10% for English prose
+    _ENCODING = None
+
+_WORD = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return int(len(_WORD.findall(text)) * 1.15) + 1
+
+
+# --- Boilerplate ---
+
+_DIGITS = re.compile(r"\d+")
+
+
+def _line_key(line: str) -> str:
+    text = " ".join(line.split()).lower()
+    # Digits are ignored only in short non-heading lines ("Page 3 of 9", "Rev. 2 - 2024"),
+    # so numbered clause headings at the top of each page are never mistaken for boilerplate
+    if len(text.split()) <= 6 and heading_level(line) is None:
+        return _DIGITS.sub("#", text)
+    return text
+
+
+def boilerplate_lines(pages: list[str], min_fraction: float = BOILERPLATE_MIN_FRACTION) -> set[str]:
+    """Normalized lines repeated at the edges of at least min_fraction of the pages."""
+    if len(pages) < 3:
+        return set()
+    counts: Counter = Counter()
+    for text in pages:
+        lines = [line for line in text.splitlines() if line.strip()]
+        edges = lines[:BOILERPLATE_EDGE_LINES] + lines[-BOILERPLATE_EDGE_LINES:]
+        counts.update({_line_key(line) for line in edges})
+    threshold = max(2, int(len(pages) * min_fraction))
+    return {key for key, count in counts.items() if count >= threshold and key}
+
+
+# --- Headings ---
+
+_NUMBERED = re.compile(r"^(\d+(?:\.\d+)*)[.)]?\s+(\S.*)$")
+_NAMED = re.compile(r"^(section|article|clause|chapter|part|annexure|appendix|schedule)\s+([\w.]+)\b[:.\-\s]*(.*)$", re.I)
+_MAX_HEADING_CHARS = 90
+
+
+def heading_level(line: str) -> int | None:
+    """Heading depth (1 = top level) or None for body text."""
+    text = line.strip()
+    if not text or len(text) > _MAX_HEADING_CHARS:
+        return None
+    numbered = _NUMBERED.match(text)
+    if numbered:
+        words = numbered.group(2).split()
+        # "1. Employees must apply in advance." is a list item, not a clause heading
+        if len(words) > 12 or words[0][:1].islower() or (text.endswith(".") and len(words) > 6):
+            return None
+        return numbered.group(1).count(".") + 1
+    if text.endswith((".", ",", ";")):
+        return None
+    if _NAMED.match(text):
+        return 1
+    letters = [c for c in text if c.isalpha()]
+    if len(letters) >= 4 and all(c.isupper() for c in letters) and len(text.split()) <= 10:
+        return 1
+    return None
+
+
+# --- Chunking ---
+
+@dataclass
+class _Block:
+    text: str
+    page_number: int
+    section_path: tuple[str, ...]
+    is_heading: bool = False
+    tokens: int = 0
+
+
+@dataclass
+class StructuredChunk:
+    text: str
+    page_number: int
+    page_end: int
+    section_path: tuple[str, ...] = field(default_factory=tuple)
+
+    @property
+    def metadata(self) -> dict:
+        return {
+            "page_number": self.page_number,
+            "page_end": self.page_end,
+            "section": self.section_path[-1] if self.section_path else "",
+            "section_path": " > ".join(self.section_path),
+        }
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+(?=[A-Z0-9(\"'])")
+
+
+def _split_oversized(text: str, max_tokens: int) -> list[str]:
+    """Split at sentence boundaries, falling back to words for run-on text."""
+    pieces, current = [], ""
+    for sentence in _SENTENCE_END.split(text):
+        candidate = f"{current} {sentence}".strip()
+        if current and count_tokens(candidate) > max_tokens:
+            pieces.append(current)
+            candidate = sentence
+        current = candidate
+        while count_tokens(current) > max_tokens:
+            words = current.split()
+            cut = max(1, int(len(words) * max_tokens / count_tokens(current)))
+            pieces.append(" ".join(words[:cut]))
+            current = " ".join(words[cut:])
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _blocks(pages: list[tuple[int, str]], boilerplate: set[str], max_tokens: int) -> list[_Block]:
+    blocks: list[_Block] = []
+    path: list[tuple[int, str]] = []
+    paragraph: list[str] = []
+    paragraph_page = 0
+
+    def flush():
+        nonlocal paragraph
+        if paragraph:
+            text = " ".join(paragraph)
+            section = tuple(title for _, title in path)
+            for piece in _split_oversized(text, max_tokens):
+                blocks.append(_Block(piece, paragraph_page, section, tokens=count_tokens(piece)))
+            paragraph = []
+
+    for page_number, text in pages:
+        for raw in text.splitlines():
+            line = " ".join(raw.split())
+            if not line:
+                flush()
+                continue
+            if _line_key(line) in boilerplate:
+                continue
+            level = heading_level(line)
+            if level is not None:
+                flush()
+                while path and path[-1][0] >= level:
+                    path.pop()
+                path.append((level, line))
+                blocks.append(_Block(line, page_number, tuple(t for _, t in path), True, count_tokens(line)))
+                continue
+            if not paragraph:
+                paragraph_page = page_number
+            paragraph.append(line)
+    flush()
+    return blocks
+
+
+def structured_chunks(pages: list[tuple[int, str]], max_tokens: int = CHUNK_TOKENS,
+                      overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list[StructuredChunk]:
+    """Chunk a document given as [(page_number, text)]."""
+    overlap_tokens = min(overlap_tokens, max_tokens // 4)
+    boilerplate = boilerplate_lines([text for _, text in pages])
+    chunks: list[StructuredChunk] = []
+    current: list[_Block] = []
+    tokens = 0
+
+    def emit() -> None:
+        chunks.append(StructuredChunk(
+            text="\n".join(block.text for block in current),
+            page_number=current[0].page_number,
+            page_end=current[-1].page_number,
+            section_path=current[-1].section_path,
+        ))
+
+    for block in _blocks(pages, boilerplate, max_tokens - overlap_tokens):
+        has_body = any(not b.is_heading for b in current)
+        # New top-level sections always start a chunk; subsections only once this one has some substance
+        boundary = block.is_heading and has_body and (
+            block.section_path[:1] != current[-1].section_path[:1] or tokens >= max_tokens // 3
+        )
+        overflow = has_body and tokens + block.tokens > max_tokens
+        if boundary or overflow:
+            emit()
+            previous, current, tokens = current, [], 0
+            if not boundary:
+                # Carry the tail of the previous chunk into the next one within the same section
+                for carried in reversed(previous):
+                    if carried.is_heading or tokens + carried.tokens > overlap_tokens:
+                        break
+                    current.insert(0, carried)
+                    tokens += carried.tokens
+        current.append(block)
+        tokens += block.tokens
+    if current and (any(not b.is_heading for b in current) or not chunks):
+        emit()
+    return chunks
@@ -0,0 +1,175 @@
+"""
+Compresses search hits before they reach the LLM.
+
+  1. hits on the same page are merged, dropping the splitter's overlap;
+  2. sentences already returned by a higher-ranked hit are dropped;
+  3. each passage keeps the sentences that contain query terms plus
+     CONTEXT_NEIGHBOR_SENTENCES either side (a hit that matched by meaning only
+     keeps its lead sentences);
+  4. passages are added in rank order until CONTEXT_TOKEN_BUDGET is spent.
+
+Every passage starts with a [source_file, p. N, section] citation line.
+"""
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable
+
+from bm25_index import tokenize
+from chunking import count_tokens
+from hybrid_search import Candidate
+from page_store import merge_chunks
+
+logger = logging.getLogger("DocIngestorAndRetrieval.context_compression")
+
+# Config
+CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "true").lower() in ("1", "true", "yes")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+CONTEXT_NEIGHBOR_SENTENCES = int(os.getenv("CONTEXT_NEIGHBOR_SENTENCES", "1"))
+CONTEXT_LEAD_SENTENCES = 3
+# Passages shorter than this are kept whole; trimming them saves little and loses context
+CONTEXT_MIN_TRIM_TOKENS = 60
+
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+(?=[A-Z0-9(\"'])")
+GAP = " … "
+
+
+def split_sentences(text: str) -> list[str]:
+    sentences = []
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        if line:
+            sentences.extend(s for s in _SENTENCE_END.split(line) if s)
+    return sentences
+
+
+def _sentence_key(sentence: str) -> str:
+    return " ".join(re.findall(r"\w+", sentence.lower()))
+
+
+def merge_same_page(first: str, second: str) -> str:
+    """Join two chunks of one page in whichever order their overlap lines up."""
+    if second in first:
+        return first
+    if first in second:
+        return second
+    return min(merge_chunks([first, second]), merge_chunks([second, first]), key=len)
+
+
+@dataclass
+class Passage:
+    source_file: str
+    page_number: int | None
+    page_end: int | None
+    section: str
+    content: str
+    sentences: list[str] = field(default_factory=list)
+    scores: list[float] = field(default_factory=list)
+
+    @property
+    def citation(self) -> str:
+        parts = [self.source_file or "unknown source"]
+        if self.page_number is not None:
+            span = self.page_number if self.page_end in (None, self.page_number) else f"{self.page_number}-{self.page_end}"
+            parts.append(f"p. {span}")
+        if self.section:
+            parts.append(self.section)
+        return f"[{', '.join(parts)}]"
+
+
+def group_passages(candidates: list[Candidate]) -> list[Passage]:
+    """One passage per (source_file, page) in the rank order of its best hit."""
+    passages: dict[tuple, Passage] = {}
+    for candidate in candidates:
+        metadata = candidate.metadata or {}
+        source_file = metadata.get("source_file", "")
+        page_number = metadata.get("page_number")
+        key = (source_file, page_number) if source_file and page_number is not None else ("", candidate.id)
+        passage = passages.get(key)
+        if passage is None:
+            passages[key] = Passage(
+                source_file, page_number, metadata.get("page_end"),
+                metadata.get("section", ""), candidate.content,
+            )
+        else:
+            passage.content = merge_same_page(passage.content, candidate.content)
+            page_end = metadata.get("page_end")
+            if page_end is not None and (passage.page_end is None or page_end > passage.page_end):
+                passage.page_end = page_end
+    return list(passages.values())
+
+
+def _select(scores: list[float], neighbors: int) -> list[int]:
+    matched = [i for i, score in enumerate(scores) if score > 0]
+    if not matched:
+        return list(range(min(CONTEXT_LEAD_SENTENCES, len(scores))))
+    keep = set()
+    for i in matched:
+        keep.update(range(max(0, i - neighbors), min(len(scores), i + neighbors + 1)))
+    return sorted(keep)
+
+
+def _render(sentences: list[str], indices: list[int]) -> str:
+    text, previous = "", None
+    for i in indices:
+        if previous is not None:
+            text += " " if i == previous + 1 else GAP
+        elif i > 0:
+            text += GAP.lstrip()
+        text += sentences[i]
+        previous = i
+    return text
+
+
+def compress(query: str, candidates: list[Candidate], token_budget: int = CONTEXT_TOKEN_BUDGET,
+             neighbors: int = CONTEXT_NEIGHBOR_SENTENCES,
+             idf: Callable[[str], float] | None = None) -> list[str]:
+    """Ranked candidates -> cited, deduplicated passages within token_budget tokens."""
+    terms = set(tokenize(query))
+    weight = idf or (lambda term: 1.0)
+    seen: set[str] = set()
+    results: list[str] = []
+    spent = 0
+
+    for passage in group_passages(candidates):
+        duplicates = 0
+        for sentence in split_sentences(passage.content):
+            key = _sentence_key(sentence)
+            if not key or key in seen:
+                duplicates += bool(key)
+                continue
+            seen.add(key)
+            passage.sentences.append(sentence)
+            passage.scores.append(sum(weight(term) for term in terms.intersection(tokenize(sentence))))
+        if not passage.sentences or (duplicates and not any(passage.scores)):
+            # Nothing left, or only the filler around sentences a better hit already returned
+            continue
+
+        text = " ".join(passage.sentences)
+        if count_tokens(text) > CONTEXT_MIN_TRIM_TOKENS:
+            indices = _select(passage.scores, neighbors)
+            text = _render(passage.sentences, indices)
+        else:
+            indices = list(range(len(passage.sentences)))
+
+        header = passage.citation
+        remaining = token_budget - spent - count_tokens(header)
+        if count_tokens(text) > remaining:
+            # Drop the weakest sentences until the passage fits; the top hit always keeps its best one
+            by_score = sorted(indices, key=lambda i: passage.scores[i], reverse=True)
+            while len(by_score) > 1 and count_tokens(_render(passage.sentences, sorted(by_score))) > remaining:
+                by_score.pop()
+            text = _render(passage.sentences, sorted(by_score))
+            if count_tokens(text) > remaining and results:
+                break
+        results.append(f"{header}\n{text}")
+        spent += count_tokens(results[-1])
+        if spent >= token_budget:
+            break
+
+    logger.debug(
+        f"Compressed {len(candidates)} hits ({sum(count_tokens(c.content) for c in candidates)} tokens) "
+        f"to {len(results)} passages ({spent} tokens)"
+    )
+    return results
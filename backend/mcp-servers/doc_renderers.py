@@ -0,0 +1,206 @@
+"""
+Document writers run by the render pool's worker processes.
+
+Each writer takes plain data plus the output path, so jobs pickle cheaply and
+workers never import the MCP server module.
+"""
+import re
+import zipfile
+from io import BytesIO
+from typing import Dict, List
+
+from docx import Document
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfgen import canvas
+
+from template_registry import TemplateRegistry
+
+# Loaded by the server at startup; forked workers inherit it, spawned ones load it in warm_up
+templates = TemplateRegistry()
+
+
+def warm_up() -> None:
+    """Pool initializer: load the PPT templates and parse a spare copy of each."""
+    if not templates.loaded:
+        templates.load()
+    templates.prime()
+
+
+def write_word_doc(content: str, file_path: str) -> None:
+    doc = Document()
+    doc.add_heading("Generated Document", 0)
+    doc.add_paragraph(content)
+    doc.save(file_path)
+
+
+def write_ppt(slides: List[Dict], template: str, file_path: str) -> None:
+    prs = templates.presentation(template)
+
+    for idx, slide_info in enumerate(slides):
+        layout_idx = slide_info["layout"]
+        placeholders = slide_info["placeholders"]
+
+        try:
+            slide_layout = prs.slide_layouts[layout_idx]
+            slide = prs.slides.add_slide(slide_layout)
+
+            for ph in slide.placeholders:
+                try:
+                    if ph.placeholder_format.idx == 0 and len(placeholders) > 0:
+                        ph.text = placeholders[1]  # heading or title
+                    elif ph.placeholder_format.idx == 10 and len(placeholders) > 1:
+                        ph.text = placeholders[0]  # content
+                except Exception as e:
+                    print(f"Warning: Failed to set text in placeholder '{ph.name}' on slide {idx}: {e}")
+
+        except Exception as e:
+            print(f"Error adding slide {idx}: {e}")
+
+    prs.save(file_path)
+
+
+CERT_PAGE_SIZE = landscape(A4)
+CERT_MARGIN = 50
+CERT_BACKGROUND_FORM = "certificate_background"
+CERT_WATERMARK_FORM = "certificate_watermark"
+
+
+def _draw_certificate_background(c: canvas.Canvas, width: float, height: float, margin: float) -> None:
+    # Borders
+    c.setStrokeColor(colors.HexColor("#000000"))
+    c.setLineWidth(3)
+    c.rect(margin, margin, width - 2 * margin, height - 2 * margin)
+
+    c.setStrokeColor(colors.lightgrey)
+    c.setLineWidth(1)
+    c.rect(margin + 10, margin + 10, width - 2 * (margin + 10), height - 2 * (margin + 10))
+
+    # Header
+    c.setFont("Helvetica-Bold", 22)
+    c.setFillColor(colors.HexColor("#000000"))
+    c.drawCentredString(width / 2, height - margin - 30, "Orion Innovation")
+
+    c.setFont("Helvetica", 12)
+    c.setFillColor(colors.black)
+    c.drawCentredString(width / 2, height - margin - 50, "Global Technology Services | www.orioninc.com")
+
+    # Title
+    c.setFont("Helvetica-Bold", 26)
+    c.setFillColor(colors.black)
+    c.drawCentredString(width / 2, height - margin - 100, "BONAFIDE CERTIFICATE")
+
+    # Signature
+    c.setFont("Helvetica", 12)
+    c.drawString(width - margin - 220, margin + 60, "HR Manager – Orion Innovation")
+    c.drawString(width - margin - 220, margin + 80, "__________________________")
+
+
+def _draw_certificate_watermark(c: canvas.Canvas, width: float, height: float) -> None:
+    # Watermark (bounded within border)
+    c.saveState()
+    c.setFont("Helvetica-Bold", 40)
+    c.setFillGray(0.90, 0.5)
+    c.translate(width / 2, height / 2)
+    c.rotate(45)
+    c.drawCentredString(0, 0, "ORION INNOVATION")
+    c.restoreState()
+
+
+def _define_certificate_forms(c: canvas.Canvas) -> None:
+    """Record the static layers once per PDF as form XObjects that every page references."""
+    width, height = CERT_PAGE_SIZE
+    c.beginForm(CERT_BACKGROUND_FORM)
+    _draw_certificate_background(c, width, height, CERT_MARGIN)
+    c.endForm()
+    c.beginForm(CERT_WATERMARK_FORM)
+    _draw_certificate_watermark(c, width, height)
+    c.endForm()
+
+
+def _draw_certificate_page(c: canvas.Canvas, data: Dict, valid_till: str) -> None:
+    width, height = CERT_PAGE_SIZE
+    margin = CERT_MARGIN
+    c.doForm(CERT_BACKGROUND_FORM)
+
+    # Body Content
+    content_text = (
+        f"This is to certify that Mr./Ms. {data['student_name']} is working as a "
+        f"in Orion Innovation. This certificate is issued for his {data['program_name']} related purposes.\n\n"
+        f"This is valid till: {valid_till}"
+    )
+
+    c.setFillColor(colors.black)
+    c.setFont("Helvetica", 14)
+    text_obj = c.beginText()
+    text_obj.setTextOrigin(margin + 70, height - margin - 150)
+    text_obj.setLeading(22)
+    max_width = width - 2 * (margin + 70)
+
+    for line in content_text.split("\n"):
+        words = line.split()
+        buffer = ""
+        for word in words:
+            test_line = f"{buffer} {word}".strip()
+            if c.stringWidth(test_line, "Helvetica", 14) < max_width:
+                buffer = test_line
+            else:
+                text_obj.textLine(buffer)
+                buffer = word
+        if buffer:
+            text_obj.textLine(buffer)
+    c.drawText(text_obj)
+
+    # Certificate ID
+    c.setFont("Helvetica-Oblique", 10)
+    c.drawString(margin + 10, margin + 40, f"Certificate ID: {data['certificate_id']}")
+
+    c.doForm(CERT_WATERMARK_FORM)
+
+
+def write_certificate_pdf(data: Dict, valid_till: str, pdf_path: str | BytesIO) -> None:
+    c = canvas.Canvas(pdf_path, pagesize=CERT_PAGE_SIZE)
+    _define_certificate_forms(c)
+    _draw_certificate_page(c, data, valid_till)
+    c.save()
+
+
+def certificate_filename(data: Dict) -> str:
+    safe = re.sub(r"[^\w\d-]+", "_", data["student_name"])[:30]
+    return f"Bonafide_{safe}_{data['certificate_id']}.pdf"
+
+
+def write_certificate_batch(certificates: List[Dict], valid_till: str, output: str, path: str) -> None:
+    """All certificates as one multi-page PDF sharing the static forms, or a zip of one PDF each."""
+    if output == "pdf":
+        c = canvas.Canvas(path, pagesize=CERT_PAGE_SIZE)
+        _define_certificate_forms(c)
+        for data in certificates:
+            _draw_certificate_page(c, data, valid_till)
+            c.showPage()
+        c.save()
+        return
+    # PDFs are already compressed, so entries are stored as-is
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for data in certificates:
+            buffer = BytesIO()
+            write_certificate_pdf(data, valid_till, buffer)
+            archive.writestr(certificate_filename(data), buffer.getvalue())
+
+
+def merge_certificate_parts(parts: List[str], output: str, path: str) -> None:
+    """Join per-worker batch parts, in order, into one PDF or zip."""
+    if output == "pdf":
+        from pypdf import PdfWriter
+
+        writer = PdfWriter()
+        for part in parts:
+            writer.append(part)
+        with open(path, "wb") as f:
+            writer.write(f)
+        return
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for part in parts:
+            with zipfile.ZipFile(part) as source:
+                for name in source.namelist():
+                    archive.writestr(name, source.read(name))
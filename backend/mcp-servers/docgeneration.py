@@ -1,41 +1,57 @@
+import asyncio
 import os
 import re
 import glob
-import pandas as pd
-from io import StringIO
 from typing import List
-from docx import Document
-from pptx import Presentation
 from tempfile import gettempdir
 from datetime import datetime
 import hashlib
+import json
 # from fastapi import FastAPI
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
 from typing import Dict, List
 from pydantic import BaseModel
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import landscape, A4
-from reportlab.lib import colors
 import random
 import string
 from datetime import datetime, timedelta
+from functools import partial
 
 
 load_dotenv()
 
+from artifact_server import ARTIFACT_PUBLIC_BASE_URL, ROUTE, ArtifactServer
+from artifact_store import Artifact, ArtifactStore
+from doc_renderers import (
+    merge_certificate_parts, templates, warm_up, write_certificate_batch, write_certificate_pdf,
+    write_ppt, write_word_doc,
+)
+from excel_stream import resolve_input_path, write_excel_sheets
+from render_pool import RenderPool
+from template_registry import DEFAULT_PPT_TEMPLATE, TemplateError
+
 GEN_DOC_PORT = int(os.getenv("PORT", os.getenv("GEN_DOC_PORT", 8000)))
+CERT_BATCH_MAX = int(os.getenv("CERT_BATCH_MAX", "1000"))
+# Zip batches smaller than this per worker are not split; the split costs more than it saves
+CERT_BATCH_MIN_PER_WORKER = int(os.getenv("CERT_BATCH_MIN_PER_WORKER", "25"))
+# Streaming a multi-million-row export takes longer than the default render timeout
+EXCEL_RENDER_TIMEOUT_SECONDS = float(os.getenv("EXCEL_RENDER_TIMEOUT_SECONDS", "900"))
 mcp = FastMCP("GenerateDocuments", port=GEN_DOC_PORT)
-BASE_URL = os.path.dirname(os.path.abspath(__file__))
-BACKEND_DIR = os.path.abspath(os.path.join(BASE_URL, ".."))
-PPT_TEMPLATE_DATA_DIR = os.path.join(BACKEND_DIR, "data", "doctemplates")
-ppt_filename = "Orion_Innovation_Template.pptx"
-ppt_template_path = os.path.join(PPT_TEMPLATE_DATA_DIR, ppt_filename)
 TEMP_DIR = gettempdir()
 os.makedirs(TEMP_DIR, exist_ok=True)
 
-# Metadata store to map content hashes to filenames
-generated_docs = {}
+# Generated files keyed by a hash of their input, persisted across restarts and workers
+artifact_store = ArtifactStore()
+artifact_store.evict()
+# key -> the render in flight for it, so concurrent misses share one
+_pending_renders: dict[str, asyncio.Future] = {}
+# Signed, expiring download links served by this process next to /sse
+artifact_server = ArtifactServer(artifact_store, ARTIFACT_PUBLIC_BASE_URL or f"http://localhost:{GEN_DOC_PORT}")
+mcp.custom_route(ROUTE, methods=["GET", "HEAD"])(artifact_server.handle)
+# PPT templates are read and validated once; render workers inherit or reload them
+templates.load()
+# python-pptx, python-docx, XlsxWriter and reportlab work runs in worker processes, off the event loop
+render_pool = RenderPool(initializer=warm_up)
 
 ORG_NAME = "ORION INNOVATION"
 CERT_PREFIX = "OI"
@@ -45,6 +61,11 @@ class Slide(BaseModel):
     layout: int
     placeholders: List[str]
 
+class ExcelSheet(BaseModel):
+    name: str
+    csv_data: str = None
+    csv_path: str = None
+
 class CertificateData(BaseModel):
     student_name: str
     program_name: str
@@ -63,25 +84,46 @@ def sanitize_filename(text: str, max_length: int = 50) -> str:
 def get_content_hash(content: str) -> str:
     return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
+def artifact_key(kind: str, content: str) -> str:
+    return get_content_hash(f"{kind}\n{content}")
+
+async def store_artifact(kind: str, content: str, filename: str, render_to) -> str:
+    """Download link for the stored artifact of (kind, content); on a miss `await render_to(path)` creates it."""
+    key = artifact_key(kind, content)
+    artifact = await asyncio.to_thread(artifact_store.get, key)
+    if artifact is None:
+        # Concurrent misses for one key share a single render, coordinated on the event loop
+        pending = _pending_renders.get(key)
+        if pending is None:
+            pending = _pending_renders[key] = asyncio.ensure_future(create_artifact(key, kind, filename, render_to))
+            pending.add_done_callback(lambda _: _pending_renders.pop(key, None))
+        artifact = await asyncio.shield(pending)
+    return artifact_server.url(artifact)
+
+async def create_artifact(key: str, kind: str, filename: str, render_to) -> Artifact:
+    """Render into a reserved scratch path and commit it; only the short store calls go to a thread."""
+    artifact = await asyncio.to_thread(artifact_store.get, key)
+    if artifact is not None:
+        return artifact  # finished by a render that completed since the caller's lookup
+    scratch_path = await asyncio.to_thread(artifact_store.reserve, filename)
+    try:
+        await render_to(scratch_path)
+        return await asyncio.to_thread(artifact_store.commit, key, kind, filename, scratch_path)
+    finally:
+        await asyncio.to_thread(artifact_store.discard, scratch_path)
+
+async def render_artifact(kind: str, content: str, filename: str, writer, *args) -> str:
+    """store_artifact() with writer(*args, path) run as one render pool job."""
+    return await store_artifact(kind, content, filename, lambda path: render_pool.run(writer, *args, path))
+
 def generate_timestamped_filename(base_name: str, ext: str) -> str:
     timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
     return f"{base_name}_{timestamp}.{ext}"
 
-def combine_placeholders(slides: List[Slide]) -> List[Dict]:
-    structured = []
-    for slide in slides:
-        title = slide.placeholders[0] if slide.placeholders else ""
-        content = "\n".join(slide.placeholders[1:]) if len(slide.placeholders) > 1 else ""
-        structured.append({
-            "layout": slide.layout,
-            "placeholders": [title, content] if content else [title]
-        })
-    return structured
-
 def generate_pdf_filename(base_name: str) -> str:
     timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
     safe = re.sub(r"[^\w\d-]+", "_", base_name)[:30]
-    return os.path.join(TEMP_DIR, f"Bonafide_{safe}_{timestamp}.pdf")
+    return f"Bonafide_{safe}_{timestamp}.pdf"
 
 def generate_certificate_id() -> str:
     suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
@@ -104,9 +146,14 @@ When the user asks to generate a document or presentation, first use `Search_doc
         {{"layout": 1, "placeholders": ["Slide Title", "Slide Content"]}},
         ...
       ]
+    The Orion template is used by default; pass `template` to use another one from `List_PPT_Templates`.
   - Use `Generate_Word_Doc` to create a narrative report or description. Pass the text as a single string.
   - Use `Generate_Excel` if the content is tabular. Convert it to CSV first.
+    For a CSV export already on the server, pass its `csv_path` instead of the data; use `sheets` for several tables in one workbook.
   - Use `Generate_Bonafide_Certificate_PDF` only when a Bonafide Certificate is requested, with `student_name`, `program_name`, etc.
+    For several people at once, use `Generate_Bonafide_Certificates_Batch` with the list instead of one call each.
+
+Each tool returns a download link; share it with the user as-is.
 
 Avoid asking the user for more content unless the topic is ambiguous or `Search_doc` returns no useful results.
 
@@ -119,201 +166,156 @@ User query: {query}
 
 @mcp.tool(name="Generate_Word_Doc", description="Generate a Word document from input content")
 async def generate_word_doc(content: str) -> str:
-    content_hash = get_content_hash(content)
-
-    # Check reuse
-    if content_hash in generated_docs:
-        return generated_docs[content_hash]
-
-    # Generate new file
-    doc = Document()
-    doc.add_heading("Generated Document", 0)
-    doc.add_paragraph(content)
-
     filename = generate_timestamped_filename(sanitize_filename(content), "docx")
-    file_path = os.path.join(TEMP_DIR, filename)
-    doc.save(file_path)
-
-    generated_docs[content_hash] = file_path
-    return file_path
-
-@mcp.tool(name="Generate_Excel", description="Generate an Excel file from CSV string")
-async def generate_excel(csv_data: str) -> str:
-    content_hash = get_content_hash(csv_data)
-    if content_hash in generated_docs:
-        return generated_docs[content_hash]
-
-    df = pd.read_csv(StringIO(csv_data))
-    first_line = csv_data.splitlines()[0] if csv_data else "excel_data"
-    filename = generate_timestamped_filename(sanitize_filename(first_line), "xlsx")
-    file_path = os.path.join(TEMP_DIR, filename)
-    df.to_excel(file_path, index=False)
-
-    generated_docs[content_hash] = file_path
-    return file_path
-
-@mcp.tool(name="Generate_PPT", description="Generate a PowerPoint presentation from structured slide content")
-async def generate_ppt(slides: List[Slide]) -> str:
-    print(f"Structured slides received: {slides}")
-
-    # Create a hash of the slide structure for caching
-    joined_text = " ".join(" ".join(s.placeholders) for s in slides)
-    content_hash = get_content_hash(joined_text)
-
-    if content_hash in generated_docs:
-        return generated_docs[content_hash]
-
-    prs = Presentation(ppt_template_path)
-
-    # Iterate over each slide layout
-    for layout_idx, slide_layout in enumerate(prs.slide_layouts):
-        print(f"Slide Layout {layout_idx}: {slide_layout.name}")
-        for ph in slide_layout.placeholders:
-            print(f"  Placeholder idx: {ph.placeholder_format.idx}, name: '{ph.name}'")
-        print("-" * 40)
-
-    # Combine placeholders into a structured format
-    structured_slides = combine_placeholders(slides)
-    print(f"Combined placeholders: {structured_slides}")
-
-    for idx, slide_info in enumerate(slides):
-        layout_idx = slide_info.layout
-        placeholders = slide_info.placeholders
+    return await render_artifact("docx", content, filename, write_word_doc, content)
 
+@mcp.tool(
+    name="Generate_Excel",
+    description=(
+        "Generate an Excel file from a CSV string (csv_data), a CSV file in the server's export directory (csv_path), "
+        "or several named sheets each with csv_data or csv_path (sheets). The first CSV row is the header."
+    ),
+)
+async def generate_excel(csv_data: str = "", csv_path: str = "", sheets: List[ExcelSheet] = None) -> str:
+    sheets = sheets or [ExcelSheet(name="Sheet1", csv_data=csv_data, csv_path=csv_path)]
+    specs, key_parts = [], []
+    for sheet in sheets:
+        if bool(sheet.csv_data) == bool(sheet.csv_path):
+            return f"Sheet '{sheet.name}' needs exactly one of csv_data or csv_path."
+        if sheet.csv_data:
+            specs.append({"name": sheet.name, "csv_data": sheet.csv_data})
+            key_parts.append([sheet.name, get_content_hash(sheet.csv_data)])
+            continue
         try:
-            slide_layout = prs.slide_layouts[layout_idx]
-            slide = prs.slides.add_slide(slide_layout)
-
-            for ph in slide.placeholders:
-                try:
-                    if ph.placeholder_format.idx == 0 and len(placeholders) > 0:
-                        ph.text = placeholders[1]  # heading or title
-                    elif ph.placeholder_format.idx == 10 and len(placeholders) > 1:
-                        ph.text = placeholders[0]  # content
-                except Exception as e:
-                    print(f"Warning: Failed to set text in placeholder '{ph.name}' on slide {idx}: {e}")
-
-        except Exception as e:
-            print(f"Error adding slide {idx}: {e}")
+            path = resolve_input_path(sheet.csv_path)
+        except ValueError as e:
+            return str(e)
+        # Keyed by size and mtime rather than a hash, so a cache hit does not read the whole file
+        stat = os.stat(path)
+        specs.append({"name": sheet.name, "csv_path": path})
+        key_parts.append([sheet.name, path, stat.st_size, stat.st_mtime_ns])
+
+    first = sheets[0]
+    base_name = first.csv_data[:200].splitlines()[0] if first.csv_data else os.path.splitext(os.path.basename(first.csv_path))[0]
+    filename = generate_timestamped_filename(sanitize_filename(base_name), "xlsx")
+    return await store_artifact(
+        "xlsx", json.dumps(key_parts), filename,
+        lambda path: render_pool.run(write_excel_sheets, specs, path, timeout=EXCEL_RENDER_TIMEOUT_SECONDS),
+    )
 
+@mcp.tool(name="Generate_PPT", description="Generate a PowerPoint presentation from structured slide content using a named template")
+async def generate_ppt(slides: List[Slide], template: str = DEFAULT_PPT_TEMPLATE) -> str:
+    try:
+        ppt_template = templates.get(template)
+    except TemplateError as e:
+        return str(e)
+    invalid = [s.layout for s in slides if ppt_template.layout(s.layout) is None]
+    if invalid:
+        return (f"Layout(s) {invalid} do not exist in template '{ppt_template.name}'. "
+                f"Valid layouts: {[(l.index, l.name) for l in ppt_template.layouts]}")
+
+    # Layouts and the template version are part of the key: either change gives a different deck
+    slide_data = [{"layout": s.layout, "placeholders": s.placeholders} for s in slides]
+    joined_text = " ".join(" ".join(s.placeholders) for s in slides)
     filename = generate_timestamped_filename(sanitize_filename(joined_text), "pptx")
-    file_path = os.path.join(TEMP_DIR, filename)
-    prs.save(file_path)
+    return await render_artifact(
+        "pptx", f"{ppt_template.sha256}\n{json.dumps(slide_data)}", filename,
+        write_ppt, slide_data, ppt_template.name,
+    )
 
-    generated_docs[content_hash] = file_path
-    return file_path
+@mcp.tool(name="List_PPT_Templates", description="List the PowerPoint templates available to Generate_PPT with their slide layouts and placeholders")
+async def list_ppt_templates() -> list[dict]:
+    return [ppt_template.describe() for ppt_template in templates.templates.values()]
 
 def generate_certificate_id(prefix="ORION") -> str:
     date_part = datetime.now().strftime("%Y%m%d")
     rand_part = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
     return f"{prefix}-{date_part}-{rand_part}"
 
+def prepare_certificate(data: CertificateData) -> str:
+    """Fill in the issue date and id if missing; returns the validity date (end of next month)."""
+    today = datetime.now()
+    next_month = (today.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    data.issue_date = data.issue_date or today.strftime("%d-%m-%Y")
+    data.certificate_id = data.certificate_id or generate_certificate_id()
+    return next_month.strftime('%d-%m-%Y')
+
 @mcp.tool(
     name="Generate_Bonafide_Certificate_PDF",
     description="Generate a Bonafide/Employment Certificate for Orion Innovation."
 )
 async def generate_certificate_pdf(data: CertificateData) -> str:
-    today = datetime.now()
-    next_month = (today.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-    data.issue_date = data.issue_date or today.strftime("%d-%m-%Y")
-    data.certificate_id = data.certificate_id or generate_certificate_id()
+    valid_till = prepare_certificate(data)
 
-    key_string = f"{data.student_name}|{data.program_name}|{data.issue_date}|{data.certificate_id}"
-    content_hash = hashlib.sha256(key_string.encode("utf-8")).hexdigest()
-    if content_hash in generated_docs:
-        return generated_docs[content_hash]
-
-    pdf_path = generate_pdf_filename(data.student_name)
-    c = canvas.Canvas(pdf_path, pagesize=landscape(A4))
-    width, height = landscape(A4)
-    margin = 50
-
-    # Borders
-    c.setStrokeColor(colors.HexColor("#000000"))
-    c.setLineWidth(3)
-    c.rect(margin, margin, width - 2 * margin, height - 2 * margin)
-
-    c.setStrokeColor(colors.lightgrey)
-    c.setLineWidth(1)
-    c.rect(margin + 10, margin + 10, width - 2 * (margin + 10), height - 2 * (margin + 10))
-
-    # Header
-    c.setFont("Helvetica-Bold", 22)
-    c.setFillColor(colors.HexColor("#000000"))
-    c.drawCentredString(width / 2, height - margin - 30, "Orion Innovation")
-
-    c.setFont("Helvetica", 12)
-    c.setFillColor(colors.black)
-    c.drawCentredString(width / 2, height - margin - 50, "Global Technology Services | www.orioninc.com")
-
-    # Title
-    c.setFont("Helvetica-Bold", 26)
-    c.setFillColor(colors.black)
-    c.drawCentredString(width / 2, height - margin - 100, "BONAFIDE CERTIFICATE")
-
-    # Body Content
-    content_text = (
-        f"This is to certify that Mr./Ms. {data.student_name} is working as a "
-        f"in Orion Innovation. This certificate is issued for his {data.program_name} related purposes.\n\n"
-        f"This is valid till: {next_month.strftime('%d-%m-%Y')}"
+    key_string = f"{data.student_name}|{data.program_name}|{data.issue_date}|{data.certificate_id}|{valid_till}"
+    return await render_artifact(
+        "pdf", key_string, generate_pdf_filename(data.student_name),
+        write_certificate_pdf, data.model_dump(), valid_till,
     )
 
-    c.setFont("Helvetica", 14)
-    text_obj = c.beginText()
-    text_obj.setTextOrigin(margin + 70, height - margin - 150)
-    text_obj.setLeading(22)
-    max_width = width - 2 * (margin + 70)
-
-    for line in content_text.split("\n"):
-        words = line.split()
-        buffer = ""
-        for word in words:
-            test_line = f"{buffer} {word}".strip()
-            if c.stringWidth(test_line, "Helvetica", 14) < max_width:
-                buffer = test_line
-            else:
-                text_obj.textLine(buffer)
-                buffer = word
-        if buffer:
-            text_obj.textLine(buffer)
-    c.drawText(text_obj)
-
-    # Signature
-    c.setFont("Helvetica", 12)
-    c.drawString(width - margin - 220, margin + 60, "HR Manager – Orion Innovation")
-    c.drawString(width - margin - 220, margin + 80, "__________________________")
-
-    # Certificate ID
-    c.setFont("Helvetica-Oblique", 10)
-    c.drawString(margin + 10, margin + 40, f"Certificate ID: {data.certificate_id}")
-
-    # Watermark (bounded within border)
-    c.saveState()
-    c.setFont("Helvetica-Bold", 40)
-    c.setFillGray(0.90, 0.5)
-    c.translate(width / 2, height / 2)
-    c.rotate(45)
-    c.drawCentredString(0, 0, "ORION INNOVATION")
-    c.restoreState()
-    c.save()
-
-    generated_docs[content_hash] = pdf_path
-    return pdf_path
+async def render_certificate_batch(certificates: List[Dict], valid_till: str, output: str, path: str) -> None:
+    """
+    A merged PDF is rendered by one worker: with the static layers as shared forms a page costs
+    well under a millisecond, less than pypdf needs to merge it again. Zips, one PDF per
+    person, are split across the render workers and their entries concatenated in order.
+    """
+    per_part = max(CERT_BATCH_MIN_PER_WORKER, -(-len(certificates) // render_pool.workers))
+    if output == "pdf":
+        per_part = len(certificates)
+    chunks = [certificates[i:i + per_part] for i in range(0, len(certificates), per_part)]
+    if len(chunks) == 1:
+        await render_pool.run(write_certificate_batch, chunks[0], valid_till, output, path)
+        return
+    parts = [f"{path}.part{i}" for i in range(len(chunks))]
+    await asyncio.gather(*(
+        render_pool.run(write_certificate_batch, chunk, valid_till, output, part)
+        for chunk, part in zip(chunks, parts)
+    ))
+    await render_pool.run(merge_certificate_parts, parts, output, path)
+
+@mcp.tool(
+    name="Generate_Bonafide_Certificates_Batch",
+    description=(
+        "Generate Bonafide/Employment Certificates for many employees at once, "
+        "as one merged PDF (output='pdf') or a zip with one PDF per employee (output='zip')."
+    ),
+)
+async def generate_certificates_batch(certificates: List[CertificateData], output: str = "pdf") -> str:
+    output = output.lower()
+    if output not in ("pdf", "zip"):
+        return "output must be 'pdf' or 'zip'."
+    if not certificates:
+        return "No certificates to generate."
+    if len(certificates) > CERT_BATCH_MAX:
+        return f"At most {CERT_BATCH_MAX} certificates can be generated per batch."
+
+    valid_till = ""
+    for data in certificates:
+        valid_till = prepare_certificate(data)
+    records = [data.model_dump() for data in certificates]
+    filename = generate_timestamped_filename(f"Bonafide_Certificates_{len(records)}", output)
+    return await store_artifact(
+        f"certificates-{output}", json.dumps([records, valid_till]), filename,
+        partial(render_certificate_batch, records, valid_till, output),
+    )
 
 @mcp.tool(name="Cleanup_Temp_Files", description="Delete all generated temporary document files")
 async def cleanup_temp_files() -> str:
-    deleted = 0
-    for ext in ["docx", "pptx", "xlsx"]:
-        pattern = os.path.join(TEMP_DIR, f"*.{ext}")
-        for filepath in glob.glob(pattern):
+    deleted = await asyncio.to_thread(artifact_store.clear)
+    # Files written to the temp dir before the artifact store existed
+    for pattern in ["*.docx", "*.pptx", "*.xlsx", "Bonafide_*.pdf"]:
+        for filepath in glob.glob(os.path.join(TEMP_DIR, pattern)):
             try:
                 os.remove(filepath)
                 deleted += 1
             except Exception:
                 pass
-    generated_docs.clear()
     return f"Deleted {deleted} temporary files."
 
+@mcp.tool(name="Get_Render_Queue_Status", description="Show document rendering queue depth, throughput and artifact cache size")
+async def get_render_queue_status() -> dict:
+    return {"render_pool": render_pool.metrics(), "artifact_store": await asyncio.to_thread(artifact_store.stats)}
+
 # --- Server Start ---
 if __name__ == "__main__":
     mcp.run(transport="sse")
@@ -1,17 +1,26 @@
 import logging
 from mcp.server.fastmcp import FastMCP
-from langchain_community.vectorstores import SupabaseVectorStore
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from difflib import get_close_matches
 from dotenv import load_dotenv
 from supabase.client import create_client
 from typing import List, Tuple
+import asyncio
 import os
 
+# Loaded before the sibling modules below, which read their config at import time
 load_dotenv()
 
+from bm25_index import BM25Index
+from context_compression import CONTEXT_COMPRESSION, compress
+from embedding_cache import CachedQueryEmbeddings
+from embeddings import load_embeddings
+from file_catalog import FileCatalog
+from hybrid_search import Candidate, Reranker, reciprocal_rank_fusion
+from ingest_jobs import IngestJob, IngestJobManager
+from ingestion import IncrementalIngestor
+from page_store import PageStore
+from supabase_store import AsyncSupabaseStore
+from vector_index import LocalVectorIndex, export_snapshot
+
 # Configure logging
 logging.basicConfig(
     level=logging.DEBUG,
@@ -21,14 +30,27 @@ logger = logging.getLogger("DocIngestorAndRetrieval")
 
 # Config
 INGESTOR_SERVER_PORT = os.getenv("INGESTOR_SERVER_PORT")
-EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 SUPABASE_TABLE_NAME = "documents"
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# "supabase" queries the match_documents RPC, "local" searches an in-process snapshot
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "supabase").lower()
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR") or os.path.join(BACKEND_DIR, "data", "embeddings", "local_index")
+PAGE_RANGE_MAX = int(os.getenv("PAGE_RANGE_MAX", "20"))
+# "hybrid" fuses BM25 and vector results, "vector" and "keyword" use one of them
+SEARCH_MODE = os.getenv("SEARCH_MODE", "hybrid").lower()
+SEARCH_MODES = ("hybrid", "vector", "keyword")
+SEARCH_CANDIDATE_MULTIPLIER = int(os.getenv("SEARCH_CANDIDATE_MULTIPLIER", "4"))
+# Ingest tools only read files under this directory; relative paths are resolved against it
+INGEST_DOCUMENTS_ROOT = os.getenv("INGEST_DOCUMENTS_ROOT") or os.path.join(BACKEND_DIR, "data", "documents")
+INGEST_MANIFEST_PATH = os.path.join(BACKEND_DIR, "data", "embeddings", "ingestion_manifest.json")
+INGEST_SERVER_PARSE_THREADS = int(os.getenv("INGEST_SERVER_PARSE_THREADS", "2"))
 
 logger.info("Starting DocIngestorAndRetrieval MCP server...")
 logger.debug(f"Using Supabase URL: {SUPABASE_URL}")
 logger.debug(f"Using Supabase Table: {SUPABASE_TABLE_NAME}")
+logger.debug(f"Using vector backend: {VECTOR_BACKEND}")
 
 # Init MCP and Supabase client
 mcp = FastMCP("DocIngestorAndRetrieval", port=INGESTOR_SERVER_PORT, dependencies=["langchain", "langchain_community"])
@@ -40,37 +62,110 @@ except Exception as e:
     logger.error(f"Failed to initialize Supabase client: {e}")
     raise
 
-embedding_model = GoogleGenerativeAIEmbeddings(
-    model="models/embedding-001",
-    google_api_key=os.getenv("GOOGLE_API_KEY")
+# Same provider as ingestion (EMBEDDING_PROVIDER / EMBEDDING_MODEL_NAME)
+embedding_model = load_embeddings()
+# Query embeddings go through an LRU cache and a micro-batcher that merges concurrent requests
+query_embeddings = CachedQueryEmbeddings(
+    embedding_model,
+    model_name=embedding_model.key,
+    batch_fn=embedding_model.embed_queries,
 )
 logger.info("Embedding model initialized.")
 
-def get_supabase_vectorstore():
-    logger.debug("Creating SupabaseVectorStore instance...")
-    return SupabaseVectorStore(
-        embedding=embedding_model,
-        client=supabase_client,
-        table_name=SUPABASE_TABLE_NAME,
-        query_name="match_documents"
-    )
+local_index = None
+if VECTOR_BACKEND == "local":
+    local_index = LocalVectorIndex(LOCAL_INDEX_DIR)
+    if local_index.model not in (embedding_model.key, embedding_model.model_name):
+        raise ValueError(
+            f"Local index at {LOCAL_INDEX_DIR} was built with '{local_index.model}' "
+            f"but the embedding provider is '{embedding_model.key}'"
+        )
+elif VECTOR_BACKEND != "supabase":
+    raise ValueError(f"VECTOR_BACKEND must be 'supabase' or 'local', got '{VECTOR_BACKEND}'")
+
+# Async client used by every tool handler, created once and kept alive
+supabase_store = AsyncSupabaseStore(SUPABASE_URL, SUPABASE_KEY, SUPABASE_TABLE_NAME, query_name="match_documents")
+# Distinct source_file names, loaded once and refreshed in the background when stale
+file_catalog = FileCatalog()
+page_store = PageStore(supabase_store)
+
+# Keyword index over the same chunks as the vector store
+bm25_index = BM25Index()
+if local_index is not None:
+    bm25_index.replace(local_index.records)
+reranker = Reranker()
+
+async def vector_candidates(query: str, n: int, min_score: float) -> list[Candidate]:
+    query_embedding = await query_embeddings.aembed_query(query)
+    if local_index is not None:
+        hits = await asyncio.to_thread(local_index.search, query_embedding, n)
+        rows = [(hit.id, hit.content, hit.metadata, hit.score) for hit in hits]
+    else:
+        rows = [
+            (str(row["id"]), row["content"], row.get("metadata") or {}, row.get("similarity", 0.0))
+            for row in await supabase_store.match(query_embedding, n)
+        ]
+    logger.debug(f"Retrieved {len(rows)} vector candidates")
+    return [
+        Candidate(id, content, metadata, score=score, vector_score=score)
+        for id, content, metadata, score in rows
+        if score >= min_score
+    ]
+
+
+async def keyword_candidates(query: str, n: int) -> list[Candidate]:
+    if local_index is None:
+        if bm25_index.loaded_at is None:
+            # First use: build before answering rather than silently returning no keyword hits
+            try:
+                await bm25_index.refresh(supabase_store)
+            except Exception as e:
+                logger.warning(f"BM25 index could not be loaded, keyword hits are unavailable: {e}")
+                return []
+        elif bm25_index.is_stale():
+            # Served from the previous build while the rebuild runs
+            bm25_index.refresh_in_background(supabase_store)
+    hits = bm25_index.search(query, n)
+    logger.debug(f"Retrieved {len(hits)} keyword candidates from {len(bm25_index)} chunks")
+    return [
+        Candidate(record["id"], record["content"], record.get("metadata") or {}, score=score, keyword_score=score)
+        for record, score in hits
+    ]
+
 
 @mcp.tool(
     name="Search_Documents",
-    description="Search the documents for relevant content related to doc based on a query.",
+    description=(
+        "Search the documents for relevant content related to doc based on a query. "
+        "Matches exact terms (leave types, clause numbers) and meaning in one call. "
+        "Each result starts with a [file, page, section] citation."
+    ),
 )
-def search_documents(query: str, k: int = 5, min_score: float = 0.75) -> list[str]:
+async def search_documents(query: str, k: int = 5, min_score: float = 0.75, mode: str = SEARCH_MODE,
+                           compress_results: bool = CONTEXT_COMPRESSION) -> list[str]:
     """
-    Search the Supabase vector store for relevant content based on a query.
-    Returns top-k matches.
+    Search the document chunks for relevant content based on a query.
+    Vector matches below min_score are dropped; returns top-k matches, compressed
+    to the query-relevant sentences with source citations unless compress_results is false.
     """
-    logger.info(f"Search_Documents called with query='{query}', k={k}")
+    logger.info(f"Search_Documents called with query='{query}', k={k}, min_score={min_score}, mode={mode}")
+    mode = mode.lower()
+    if mode not in SEARCH_MODES:
+        return [f"Unknown search mode '{mode}'. Use one of: {', '.join(SEARCH_MODES)}."]
     try:
-        vectorstore = get_supabase_vectorstore()
-        docs = vectorstore.similarity_search(query, k=k)
-        logger.debug(f"Retrieved {len(docs)} documents from Supabase")
+        n = max(k * SEARCH_CANDIDATE_MULTIPLIER, k)
+        rankings = []
+        if mode in ("hybrid", "vector"):
+            rankings.append(await vector_candidates(query, n, min_score))
+        if mode in ("hybrid", "keyword"):
+            rankings.append(await keyword_candidates(query, n))
 
-        return [doc.page_content for doc in docs]
+        results = reciprocal_rank_fusion(*rankings) if len(rankings) > 1 else rankings[0]
+        if reranker.enabled:
+            results = await asyncio.to_thread(reranker.rerank, query, results)
+        if compress_results:
+            return compress(query, results[:k], idf=bm25_index.idf)
+        return [candidate.content for candidate in results[:k]]
     except Exception as e:
         logger.error(f"Error in Search_Documents: {e}", exc_info=True)
         return [f"Error executing Search_Documents: {str(e)}"]
@@ -78,69 +173,172 @@ def search_documents(query: str, k: int = 5, min_score: float = 0.75) -> list[st
 
 @mcp.tool(
     name="Get_Page_Content",
-    description="Retrieve the raw text from a specific page of a document with fuzzy filename match."
+    description="Retrieve the raw text from a specific page, or a range of pages up to end_page, of a document with fuzzy filename match."
 )
-def get_page_content(page_number: int, filename_hint: str) -> str:
-    logger.info(f"Get_Page_Content called with page_number={page_number}, filename_hint='{filename_hint}'")
-    resolved_file = resolve_filename(filename_hint)
+async def get_page_content(page_number: int, filename_hint: str, end_page: int | None = None) -> str:
+    logger.info(f"Get_Page_Content called with page_number={page_number}, end_page={end_page}, filename_hint='{filename_hint}'")
+    resolved_file = await resolve_filename(filename_hint)
     if not resolved_file:
         logger.warning(f"No matching file found for '{filename_hint}'.")
         return f"No matching file found for '{filename_hint}'."
 
     logger.debug(f"Resolved filename: {resolved_file}")
 
-    try:
-        response = supabase_client.table(SUPABASE_TABLE_NAME) \
-            .select("content, metadata") \
-            .eq("metadata->>source_file", resolved_file) \
-            .order("metadata->>page_number", desc=False) \
-            .execute()
-
-        chunks = response.data if response and response.data else []
-        logger.debug(f"Found {len(chunks)} chunks for file '{resolved_file}'.")
+    last_page = end_page if end_page is not None else page_number
+    if page_number < 1 or last_page < page_number:
+        return f"Invalid page range {page_number}-{last_page}."
+    if last_page - page_number + 1 > PAGE_RANGE_MAX:
+        return f"At most {PAGE_RANGE_MAX} pages can be retrieved at once."
 
-        if not chunks:
-            logger.warning(f"No pages found for file '{resolved_file}'.")
-            return f"No pages found for file '{resolved_file}'."
+    try:
+        pages = await page_store.get_range(resolved_file, page_number, last_page)
+        logger.debug(f"Found {len(pages)} pages for file '{resolved_file}'.")
 
-        if page_number < 1 or page_number > len(chunks):
-            logger.warning(f"Page number {page_number} out of range for file '{resolved_file}' with {len(chunks)} pages.")
-            return f"Page {page_number} is out of range. This document has {len(chunks)} pages."
+        if not pages:
+            total = await page_store.page_count(resolved_file)
+            if not total:
+                logger.warning(f"No pages found for file '{resolved_file}'.")
+                return f"No pages found for file '{resolved_file}'."
+            logger.warning(f"Page {page_number} out of range for file '{resolved_file}' with {total} pages.")
+            return f"Page {page_number} is out of range. This document has {total} pages."
 
-        chunk = chunks[page_number - 1]
-        return f"Content from '{resolved_file}' page {page_number}:\n\n{chunk['content']}"
+        if end_page is None:
+            return f"Content from '{resolved_file}' page {page_number}:\n\n{pages[0]['content']}"
+        return "\n\n".join(
+            f"Content from '{resolved_file}' page {page['page_number']}:\n\n{page['content']}"
+            for page in pages
+        )
 
     except Exception as e:
         logger.error(f"Error retrieving page content: {e}", exc_info=True)
         return f"Error retrieving page content: {str(e)}"
 
-def resolve_filename(user_input: str) -> str | None:
+async def resolve_filename(user_input: str) -> str | None:
     logger.info(f"Resolving filename for input '{user_input}'")
     try:
-        response = supabase_client.table(SUPABASE_TABLE_NAME) \
-            .select("metadata") \
-            .execute()
-        
-        files = list({
-            entry["metadata"].get("source_file")
-            for entry in response.data
-            if entry.get("metadata") and entry["metadata"].get("source_file")
-        })
-        logger.debug(f"Unique source_file values retrieved: {files}")
-
-        matches = get_close_matches(user_input.lower(), [f.lower() for f in files], n=1, cutoff=0.5)
-        if matches:
-            for f in files:
-                if f.lower() == matches[0]:
-                    logger.info(f"Fuzzy matched '{user_input}' to file '{f}'")
-                    return f
-        logger.warning(f"No fuzzy match found for '{user_input}'")
+        if file_catalog.loaded_at is None:
+            await file_catalog.refresh(supabase_store)
+        elif file_catalog.is_stale():
+            file_catalog.refresh_in_background(supabase_store)
+
+        match = file_catalog.resolve(user_input)
+        if match is None and file_catalog.can_refresh():
+            # The file may have been ingested since the last refresh
+            await file_catalog.refresh(supabase_store)
+            match = file_catalog.resolve(user_input)
+
+        if match:
+            logger.info(f"Fuzzy matched '{user_input}' to file '{match}'")
+            return match
+        logger.warning(f"No fuzzy match found for '{user_input}'. Candidates: {file_catalog.search(user_input, cutoff=0.0)}")
         return None
 
     except Exception as e:
         logger.error(f"Error resolving filename: {e}", exc_info=True)
         return None
 
+# --- Ingestion ---
+
+# Shares the manifest with offlinedataembedder/main.py, so either can pick up where the other left off
+ingestor = IncrementalIngestor(
+    supabase_client, embedding_model, SUPABASE_TABLE_NAME, INGEST_MANIFEST_PATH,
+    parse_workers=INGEST_SERVER_PARSE_THREADS, use_processes=False,
+)
+
+
+async def refresh_indexes(job: IngestJob) -> None:
+    """Make a finished job's chunks visible to the filename catalog, BM25 and the local index."""
+    global local_index
+    report = job.report
+    failed = set(report.files_failed)
+    file_catalog.remove(*report.files_removed)
+    file_catalog.add(*(f for f in report.files_added if f not in failed))
+    if not (report.chunks_embedded or report.chunks_deleted):
+        return
+    if local_index is not None:
+        # The width is only needed once the last document is gone; resolving it may probe the model, so off the loop
+        await asyncio.to_thread(lambda: export_snapshot(
+            supabase_client, SUPABASE_TABLE_NAME, LOCAL_INDEX_DIR, embedding_model.key,
+            dim=local_index.dim or ingestor.embedding_metadata.get("embedding_dim", 0),
+        ))
+        local_index = await asyncio.to_thread(LocalVectorIndex, LOCAL_INDEX_DIR)
+        await bm25_index.areplace(local_index.records)
+    else:
+        # Only the job's files (failed ones too, they may be partly written) are re-read from the documents table
+        await bm25_index.update_files(
+            supabase_store,
+            changed=report.files_added + report.files_changed,
+            removed=report.files_removed,
+        )
+    logger.info(f"Search indexes refreshed after ingest job {job.id}.")
+
+
+ingest_jobs = IngestJobManager(ingestor, on_complete=refresh_indexes)
+
+
+def resolve_ingest_path(path: str) -> str:
+    root = os.path.realpath(INGEST_DOCUMENTS_ROOT)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"'{path}' is outside the documents directory.")
+    return resolved
+
+
+@mcp.tool(
+    name="Ingest_Document",
+    description=(
+        "Ingest (or re-ingest) one PDF from the documents directory so it becomes searchable. "
+        "Runs in the background and returns a job id to poll with Get_Ingest_Job_Status."
+    ),
+)
+async def ingest_document(path: str) -> dict:
+    logger.info(f"Ingest_Document called with path='{path}'")
+    try:
+        resolved = resolve_ingest_path(path)
+    except ValueError as e:
+        return {"error": str(e)}
+    if not os.path.isfile(resolved) or not resolved.lower().endswith(".pdf"):
+        return {"error": f"'{path}' is not a PDF in the documents directory."}
+    job = ingest_jobs.submit("document", path, {os.path.basename(resolved): resolved})
+    return job.to_dict()
+
+
+@mcp.tool(
+    name="Ingest_Directory",
+    description=(
+        "Ingest every PDF in a folder of the documents directory; unchanged files are skipped. "
+        "With remove_missing, documents no longer in the folder are deleted from the index. "
+        "Runs in the background and returns a job id to poll with Get_Ingest_Job_Status."
+    ),
+)
+async def ingest_directory(directory: str = "Policies", remove_missing: bool = False) -> dict:
+    logger.info(f"Ingest_Directory called with directory='{directory}', remove_missing={remove_missing}")
+    try:
+        resolved = resolve_ingest_path(directory)
+    except ValueError as e:
+        return {"error": str(e)}
+    if not os.path.isdir(resolved):
+        return {"error": f"'{directory}' is not a folder in the documents directory."}
+    files = {
+        file: os.path.join(resolved, file)
+        for file in sorted(os.listdir(resolved))
+        if file.lower().endswith(".pdf")
+    }
+    job = ingest_jobs.submit("directory", directory, files, remove_missing=remove_missing, scope_dir=resolved)
+    return job.to_dict()
+
+
+@mcp.tool(
+    name="Get_Ingest_Job_Status",
+    description="Progress, throughput and result of an ingestion job started by Ingest_Document or Ingest_Directory.",
+)
+async def get_ingest_job_status(job_id: str) -> dict:
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        return {"error": f"No ingestion job with id '{job_id}'."}
+    return job.to_dict()
+
+
 if __name__ == "__main__":
     logger.info("Running MCP server...")
     mcp.run(transport="sse")
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, List
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger("DocIngestorAndRetrieval.embedding_cache")
+
+# Config
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")  # sqlite file; empty keeps the cache in memory only
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+class EmbeddingCache:
+    """Size-bounded LRU of query embeddings, optionally persisted to sqlite."""
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES, persist_path: str = EMBEDDING_CACHE_PATH):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self.metrics = {"hits": 0, "disk_hits": 0, "misses": 0}
+        if persist_path:
+            os.makedirs(os.path.dirname(os.path.abspath(persist_path)), exist_ok=True)
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (model TEXT, text TEXT, vector BLOB, PRIMARY KEY (model, text))"
+            )
+            self._db.commit()
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    def get_memory(self, model: str, text: str) -> list[float] | None:
+        """In-memory lookup only; cheap enough to call from the event loop."""
+        key = (model, text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.metrics["hits"] += 1
+            return vector
+
+    def get_disk(self, model: str, text: str) -> list[float] | None:
+        """sqlite lookup for a get_memory miss (blocking); found vectors are kept in memory."""
+        key = (model, text)
+        vector = None
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND text = ?", key
+                ).fetchone()
+            if row is not None:
+                vector = array("f", row[0]).tolist()
+        with self._lock:
+            if vector is None:
+                self.metrics["misses"] += 1
+            else:
+                self._remember(key, vector)
+                self.metrics["disk_hits"] += 1
+        return vector
+
+    def get(self, model: str, text: str) -> list[float] | None:
+        vector = self.get_memory(model, text)
+        return vector if vector is not None else self.get_disk(model, text)
+
+    def put_memory(self, model: str, text: str, vector: list[float]) -> None:
+        with self._lock:
+            self._remember((model, text), vector)
+
+    def put_disk(self, model: str, text: str, vector: list[float]) -> None:
+        """Persist one vector (blocking: commits to sqlite). No-op without persist_path."""
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO embeddings (model, text, vector) VALUES (?, ?, ?)",
+                (model, text, array("f", vector).tobytes()),
+            )
+            self._db.commit()
+
+    def put(self, model: str, text: str, vector: list[float]) -> None:
+        self.put_memory(model, text, vector)
+        self.put_disk(model, text, vector)
+
+    def _remember(self, key: tuple[str, str], vector: list[float]) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "persistent": self.persistent, **self.metrics}
+
+
+class MicroBatcher:
+    """
+    Merges embedding requests that arrive within a few milliseconds of each
+    other into one batched call, made from a background thread.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[str]], List[List[float]]],
+        window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+        max_batch: int = EMBEDDING_BATCH_MAX_SIZE,
+    ):
+        self.batch_fn = batch_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._pending: list[tuple[str, Future]] = []
+        self._cond = threading.Condition()
+        self.metrics = {"requests": 0, "batches": 0}
+        threading.Thread(target=self._run, name="embedding-batcher", daemon=True).start()
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        with self._cond:
+            self._pending.append((text, future))
+            self.metrics["requests"] += 1
+            self._cond.notify()
+        return future
+
+    def _take_batch(self) -> list[tuple[str, Future]]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.window
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = dict(zip(texts, self.batch_fn(texts)))
+            except Exception as e:
+                logger.error(f"Batched embedding of {len(texts)} texts failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.metrics["batches"] += 1
+            for text, future in batch:
+                future.set_result(vectors[text])
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    LangChain Embeddings wrapper that serves embed_query from the cache and
+    batches misses. Document embedding is passed through unchanged.
+    """
+
+    def __init__(
+        self,
+        base: Embeddings,
+        model_name: str,
+        batch_fn: Callable[[List[str]], List[List[float]]],
+        cache: EmbeddingCache | None = None,
+    ):
+        self.base = base
+        self.model_name = model_name
+        self.cache = cache or EmbeddingCache()
+        self.batcher = MicroBatcher(batch_fn)
+
+    def _lookup(self, text: str) -> tuple[str, list[float] | None]:
+        normalized = normalize_text(text)
+        return normalized, self.cache.get(self.model_name, normalized)
+
+    def embed_query(self, text: str) -> List[float]:
+        normalized, vector = self._lookup(text)
+        if vector is None:
+            vector = self.batcher.submit(normalized).result()
+            self.cache.put(self.model_name, normalized, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # Only the in-memory LRU is checked on the event loop; sqlite reads and
+        # commits run in a worker thread
+        normalized = normalize_text(text)
+        vector = self.cache.get_memory(self.model_name, normalized)
+        if vector is None:
+            if self.cache.persistent:
+                vector = await asyncio.to_thread(self.cache.get_disk, self.model_name, normalized)
+            else:
+                vector = self.cache.get_disk(self.model_name, normalized)  # just counts the miss
+        if vector is None:
+            vector = await asyncio.wrap_future(self.batcher.submit(normalized))
+            self.cache.put_memory(self.model_name, normalized, vector)
+            if self.cache.persistent:
+                await asyncio.to_thread(self.cache.put_disk, self.model_name, normalized, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.base.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.base.aembed_documents(texts)
+
+    def stats(self) -> dict:
+        return {"cache": self.cache.stats(), "batcher": self.batcher.metrics}
@@ -0,0 +1,175 @@
+"""
+Embedding providers shared by ingestion and retrieval.
+
+  google  GoogleGenerativeAIEmbeddings (network), EMBEDDING_MODEL_NAME defaults to models/embedding-001
+  local   CPU model via fastembed (ONNX) or sentence-transformers, batched across a thread pool
+  hash    deterministic feature hashing, for tests and offline benchmarks
+
+Every provider exposes `key` ("provider:model") and `dimension`; ingestion
+stores both in chunk metadata and the manifest so queries are embedded with
+the same model the corpus was built with.
+"""
+import hashlib
+import logging
+import math
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger("DocIngestorAndRetrieval.embeddings")
+
+# Config
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "google").lower()
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "")
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", str(min(4, os.cpu_count() or 1))))
+HASH_EMBEDDING_DIM = int(os.getenv("HASH_EMBEDDING_DIM", "256"))
+
+DEFAULT_MODELS = {
+    "google": "models/embedding-001",
+    "local": "BAAI/bge-small-en-v1.5",
+    "hash": f"hash-{HASH_EMBEDDING_DIM}",
+}
+
+
+class EmbeddingProvider(Embeddings):
+    provider = ""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._dimension: int | None = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}:{self.model_name}"
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self._dimension = len(self.embed_query("dimension probe"))
+        return self._dimension
+
+    def metadata(self) -> dict:
+        return {"embedding_model": self.key, "embedding_dim": self.dimension}
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Batch form of embed_query, used by the query micro-batcher."""
+        return [self.embed_query(text) for text in texts]
+
+
+class GoogleEmbeddingProvider(EmbeddingProvider):
+    provider = "google"
+
+    def __init__(self, model_name: str):
+        super().__init__(model_name)
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        self._model = GoogleGenerativeAIEmbeddings(model=model_name, google_api_key=os.getenv("GOOGLE_API_KEY"))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._model.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._model.embed_query(text)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._model.embed_documents(texts, task_type="retrieval_query")
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    ONNX model through fastembed when installed, otherwise sentence-transformers.
+    Batches are spread over a thread pool; both runtimes release the GIL.
+    """
+
+    provider = "local"
+
+    def __init__(self, model_name: str, batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE,
+                 threads: int = LOCAL_EMBEDDING_THREADS):
+        super().__init__(model_name)
+        self.batch_size = batch_size
+        self._executor = ThreadPoolExecutor(max_workers=max(1, threads), thread_name_prefix="embed")
+        self._lock = threading.Lock()
+        self._fastembed = None
+        self._st = None
+        try:
+            from fastembed import TextEmbedding
+
+            self._fastembed = TextEmbedding(model_name=model_name)
+        except ImportError:
+            from sentence_transformers import SentenceTransformer
+
+            self._st = SentenceTransformer(model_name, device="cpu")
+        logger.info(f"Local embedding model '{model_name}' loaded ({'fastembed' if self._fastembed else 'sentence-transformers'}).")
+
+    def _encode(self, texts: List[str], query: bool) -> List[List[float]]:
+        if self._fastembed is not None:
+            embed = self._fastembed.query_embed if query else self._fastembed.embed
+            return [vector.tolist() for vector in embed(texts, batch_size=len(texts))]
+        return self._st.encode(texts, batch_size=len(texts), normalize_embeddings=True).tolist()
+
+    def _encode_batched(self, texts: List[str], query: bool) -> List[List[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1:
+            return self._encode(texts, query) if texts else []
+        vectors: List[List[float]] = []
+        for result in self._executor.map(lambda batch: self._encode(batch, query), batches):
+            vectors.extend(result)
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode_batched(texts, query=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text], query=True)[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._encode_batched(texts, query=True)
+
+
+_TOKEN = re.compile(r"\w+")
+
+
+class HashEmbeddingProvider(EmbeddingProvider):
+    """Signed feature hashing of word unigrams and bigrams. Deterministic across runs and machines."""
+
+    provider = "hash"
+
+    def __init__(self, model_name: str, dimension: int = HASH_EMBEDDING_DIM):
+        super().__init__(model_name)
+        self._dimension = dimension
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self._dimension
+        tokens = _TOKEN.findall(text.lower())
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self._dimension
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+_PROVIDERS = {
+    "google": GoogleEmbeddingProvider,
+    "local": LocalEmbeddingProvider,
+    "hash": HashEmbeddingProvider,
+}
+
+
+def load_embeddings(provider: str = EMBEDDING_PROVIDER, model_name: str = EMBEDDING_MODEL_NAME) -> EmbeddingProvider:
+    if provider not in _PROVIDERS:
+        raise ValueError(f"EMBEDDING_PROVIDER must be one of {', '.join(_PROVIDERS)}, got '{provider}'")
+    embeddings = _PROVIDERS[provider](model_name or DEFAULT_MODELS[provider])
+    logger.info(f"Embedding provider: {embeddings.key}")
+    return embeddings
@@ -0,0 +1,206 @@
+"""
+CSV to xlsx in constant memory, for exports of any size.
+
+Rows are read one at a time with the csv module and written through
+XlsxWriter's constant_memory mode, which flushes each row to disk as soon as
+the next one starts and stores strings inline rather than in a shared table.
+Peak memory is set by the widest row and the type-inference sample, not by
+the number of rows.
+
+Column types (integer, number, boolean, date, datetime, text) are inferred
+from the first EXCEL_SAMPLE_ROWS data rows; a later value that does not fit
+its column's type is written as text. Values are never read as formulas. A
+sheet that reaches Excel's row limit continues on "<name> (2)" and so on,
+with the header repeated.
+"""
+import csv
+import math
+import os
+import re
+from datetime import date, datetime
+from io import StringIO
+from itertools import chain, islice
+from typing import Dict, Iterator, List
+
+import xlsxwriter
+
+# Config
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# Generate_Excel's csv_path is resolved inside this directory
+EXCEL_INPUT_DIR = os.getenv("EXCEL_INPUT_DIR") or os.path.join(BACKEND_DIR, "data", "exports")
+EXCEL_INPUT_ENCODING = os.getenv("EXCEL_INPUT_ENCODING", "utf-8-sig")
+EXCEL_SAMPLE_ROWS = int(os.getenv("EXCEL_SAMPLE_ROWS", "1000"))
+
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_MAX_COLUMNS = 16_384
+MAX_COLUMN_WIDTH = 60
+
+# Leading-zero codes ("00123") stay text; integers and decimals stop at 15 significant
+# digits, Excel's precision, so longer IDs and amounts are kept exactly as text
+EXCEL_MAX_DIGITS = 15
+_INTEGER = re.compile(rf"[+-]?(?:0|[1-9]\d{{0,{EXCEL_MAX_DIGITS - 1}}})")
+_NUMBER = re.compile(r"[+-]?(?P<mantissa>(?:0|[1-9]\d*)(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?")
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_DATETIME = re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?")
+_BOOLEANS = {"true": True, "false": False}
+_SHEET_NAME_INVALID = re.compile(r"[\[\]:*?/\\]")
+
+# In order of preference when several fit every sampled value
+COLUMN_TYPES = ("integer", "number", "boolean", "date", "datetime")
+
+
+def _is_number(value: str) -> bool:
+    match = _NUMBER.fullmatch(value)
+    if match is None:
+        return False
+    whole, _, fraction = match["mantissa"].partition(".")
+    return len((whole + fraction.rstrip("0")).lstrip("0")) <= EXCEL_MAX_DIGITS
+
+
+_CONVERTERS = {
+    "integer": (_INTEGER.fullmatch, int),
+    "number": (_is_number, float),
+    "boolean": (lambda value: value.lower() in _BOOLEANS, lambda value: _BOOLEANS[value.lower()]),
+    "date": (_DATE.fullmatch, date.fromisoformat),
+    "datetime": (_DATETIME.fullmatch, datetime.fromisoformat),
+}
+
+
+def _convert(column_type: str, value: str):
+    """value as column_type, or None if it does not fit."""
+    matches, convert = _CONVERTERS[column_type]
+    if not matches(value):
+        return None
+    try:
+        converted = convert(value)
+    except ValueError:  # e.g. 2026-02-30
+        return None
+    if isinstance(converted, float) and not math.isfinite(converted):
+        return None  # "1e999" overflows to inf, which write_number rejects
+    return converted
+
+
+def infer_column_types(width: int, sample: List[List[str]]) -> List[str]:
+    """The first of COLUMN_TYPES every non-empty sampled value fits, else "text"; empty columns are text."""
+    candidates = [set(COLUMN_TYPES) for _ in range(width)]
+    seen = [False] * width
+    for row in sample:
+        for col, value in enumerate(row[:width]):
+            value = value.strip()
+            if not value or not candidates[col]:
+                continue
+            seen[col] = True
+            candidates[col] = {t for t in candidates[col] if _convert(t, value) is not None}
+    return [
+        next((t for t in COLUMN_TYPES if t in candidates[col]), "text") if seen[col] else "text"
+        for col in range(width)
+    ]
+
+
+def sheet_name(name: str, used: set) -> str:
+    """name made valid for Excel (31 chars, no []:*?/\\) and unique within the workbook."""
+    base = _SHEET_NAME_INVALID.sub("_", name or "").strip().strip("'")[:31] or "Sheet"
+    candidate, n = base, 1
+    while candidate.lower() in used:
+        n += 1
+        suffix = f" ({n})"
+        candidate = base[:31 - len(suffix)] + suffix
+    used.add(candidate.lower())
+    return candidate
+
+
+def resolve_input_path(path: str, root: str = EXCEL_INPUT_DIR) -> str:
+    root = os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"'{path}' is outside the Excel input directory.")
+    if not os.path.isfile(resolved):
+        raise ValueError(f"'{path}' not found in the Excel input directory.")
+    return resolved
+
+
+def _rows(sheet: Dict) -> Iterator[List[str]]:
+    if sheet.get("csv_path"):
+        with open(sheet["csv_path"], newline="", encoding=EXCEL_INPUT_ENCODING) as f:
+            yield from csv.reader(f)
+    else:
+        yield from csv.reader(StringIO(sheet.get("csv_data") or ""))
+
+
+class _SheetWriter:
+    def __init__(self, workbook, formats: Dict, name: str, used: set):
+        self.workbook = workbook
+        self.formats = formats
+        self.name = name
+        self.used = used
+
+    def write(self, rows: Iterator[List[str]]) -> None:
+        """Write the header and rows, continuing on a new sheet at the row limit."""
+        header = next(rows, None) or []
+        if len(header) > EXCEL_MAX_COLUMNS:
+            raise ValueError(f"Sheet '{self.name}' has {len(header)} columns; Excel allows {EXCEL_MAX_COLUMNS}.")
+        sample = list(islice(rows, EXCEL_SAMPLE_ROWS))
+        types = infer_column_types(len(header), sample)
+        widths = [len(value) for value in header]
+        for row in sample:
+            for col, value in enumerate(row[:len(header)]):
+                widths[col] = max(widths[col], len(value))
+        widths = [min(width + 2, MAX_COLUMN_WIDTH) for width in widths]
+
+        part = 1
+        worksheet, row_index = self._start(header, widths, part), 1
+        for row in chain(sample, rows):
+            if row_index >= EXCEL_MAX_ROWS:
+                part += 1
+                worksheet, row_index = self._start(header, widths, part), 1
+            for col, value in enumerate(row[:EXCEL_MAX_COLUMNS]):
+                self._cell(worksheet, row_index, col, value, types[col] if col < len(types) else "text")
+            row_index += 1
+
+    def _start(self, header: List[str], widths: List[int], part: int):
+        name = self.name if part == 1 else f"{self.name[:24]} ({part})"
+        worksheet = self.workbook.add_worksheet(sheet_name(name, self.used))
+        for col, width in enumerate(widths):
+            worksheet.set_column(col, col, width)
+        for col, value in enumerate(header):
+            worksheet.write_string(0, col, value, self.formats["header"])
+        if header:
+            worksheet.freeze_panes(1, 0)
+        return worksheet
+
+    def _cell(self, worksheet, row: int, col: int, value: str, column_type: str) -> None:
+        if not value:
+            return
+        if column_type != "text":
+            converted = _convert(column_type, value.strip())
+            if converted is not None:
+                if column_type == "boolean":
+                    worksheet.write_boolean(row, col, converted)
+                elif column_type in ("date", "datetime"):
+                    worksheet.write_datetime(row, col, converted, self.formats[column_type])
+                else:
+                    worksheet.write_number(row, col, converted)
+                return
+        worksheet.write_string(row, col, value)
+
+
+def write_excel_sheets(sheets: List[Dict], file_path: str) -> None:
+    """
+    Stream each sheet's CSV into one workbook. A sheet is {"name", "csv_data"} or
+    {"name", "csv_path"} with an absolute path; the first CSV row is the header.
+    """
+    workbook = xlsxwriter.Workbook(file_path, {
+        "constant_memory": True,
+        "strings_to_numbers": False,
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+    })
+    formats = {
+        "header": workbook.add_format({"bold": True, "bottom": 1}),
+        "date": workbook.add_format({"num_format": "yyyy-mm-dd"}),
+        "datetime": workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"}),
+    }
+    used = set()
+    for sheet in sheets:
+        _SheetWriter(workbook, formats, sheet.get("name") or "Sheet1", used).write(_rows(sheet))
+    workbook.close()
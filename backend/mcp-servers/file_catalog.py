@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+import re
+import time
+
+logger = logging.getLogger("DocIngestorAndRetrieval.file_catalog")
+
+# Config
+FILE_CATALOG_REFRESH_SECONDS = float(os.getenv("FILE_CATALOG_REFRESH_SECONDS", "300"))
+FILE_CATALOG_MIN_REFRESH_SECONDS = float(os.getenv("FILE_CATALOG_MIN_REFRESH_SECONDS", "30"))
+FILE_CATALOG_MAX_POSTING = int(os.getenv("FILE_CATALOG_MAX_POSTING", "500"))
+FILE_MATCH_CUTOFF = float(os.getenv("FILE_MATCH_CUTOFF", "0.35"))
+
+_SEPARATORS = re.compile(r"[\W_]+")
+_EXTENSION = re.compile(r"\.(pdf|docx?|pptx?|xlsx?|txt|md)$", re.IGNORECASE)
+
+
+def _normalize(name: str) -> str:
+    return _SEPARATORS.sub(" ", _EXTENSION.sub("", name.lower())).strip()
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FileCatalog:
+    """
+    Distinct source_file names with a trigram inverted index. Matching scores
+    candidates by trigram Dice similarity plus query-token coverage.
+    """
+
+    def __init__(self):
+        self._grams: dict[str, set[str]] = {}
+        self._tokens: dict[str, list[str]] = {}
+        self._index: dict[str, set[str]] = {}
+        self.loaded_at: float | None = None
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._grams
+
+    def add(self, *names: str) -> None:
+        for name in names:
+            if not name or name in self._grams:
+                continue
+            normalized = _normalize(name)
+            grams = _trigrams(normalized)
+            self._grams[name] = grams
+            self._tokens[name] = normalized.split()
+            for gram in grams:
+                self._index.setdefault(gram, set()).add(name)
+
+    def remove(self, *names: str) -> None:
+        for name in names:
+            grams = self._grams.pop(name, None)
+            self._tokens.pop(name, None)
+            for gram in grams or ():
+                bucket = self._index.get(gram)
+                if bucket is not None:
+                    bucket.discard(name)
+                    if not bucket:
+                        del self._index[gram]
+
+    def replace(self, names) -> None:
+        names = set(names)
+        self.remove(*(set(self._grams) - names))
+        self.add(*(names - set(self._grams)))
+
+    def search(self, query: str, limit: int = 5, cutoff: float = FILE_MATCH_CUTOFF) -> list[tuple[str, float]]:
+        normalized = _normalize(query)
+        if not normalized:
+            return []
+        query_grams = _trigrams(normalized)
+        query_tokens = normalized.split()
+
+        # Candidates come from the rarest trigrams; grams shared by most of the
+        # catalog ("pol", "pdf") only add candidates if nothing rarer matched
+        postings = sorted((self._index.get(gram, ()) for gram in query_grams), key=len)
+        candidates: set[str] = set()
+        for posting in postings:
+            if candidates and len(posting) > FILE_CATALOG_MAX_POSTING:
+                break
+            candidates.update(posting)
+
+        ranked = []
+        for name in candidates:
+            grams = self._grams[name]
+            dice = 2 * len(query_grams & grams) / (len(query_grams) + len(grams))
+            name_tokens = self._tokens[name]
+            covered = sum(1 for token in query_tokens if any(t.startswith(token) for t in name_tokens))
+            score = 0.7 * dice + 0.3 * covered / len(query_tokens)
+            if score >= cutoff:
+                ranked.append((name, round(score, 4)))
+        ranked.sort(key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    def resolve(self, query: str, cutoff: float = FILE_MATCH_CUTOFF) -> str | None:
+        if query in self._grams:
+            return query
+        matches = self.search(query, limit=1, cutoff=cutoff)
+        return matches[0][0] if matches else None
+
+    # --- Loading ---
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > FILE_CATALOG_REFRESH_SECONDS
+
+    def can_refresh(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > FILE_CATALOG_MIN_REFRESH_SECONDS
+
+    async def refresh(self, store, page_size: int = 1000) -> None:
+        """Reload the distinct file names from the documents table."""
+        async with self._refresh_lock:
+            table_names = set()
+            start = 0
+            while True:
+                table = await store.table()
+                response = await table \
+                    .select("source_file:metadata->>source_file") \
+                    .order("id") \
+                    .range(start, start + page_size - 1) \
+                    .execute()
+                rows = response.data or []
+                table_names.update(row["source_file"] for row in rows if row.get("source_file"))
+                if len(rows) < page_size:
+                    break
+                start += page_size
+            self.replace(table_names)
+            self.loaded_at = time.monotonic()
+            logger.info(f"File catalog loaded with {len(self)} files.")
+
+    def refresh_in_background(self, store) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh(store))
@@ -0,0 +1,71 @@
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+
+logger = logging.getLogger("DocIngestorAndRetrieval.hybrid_search")
+
+# Config
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Cross-encoder used to rerank fused candidates, e.g. cross-encoder/ms-marco-MiniLM-L-6-v2; empty disables it
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "")
+RERANKER_MAX_CANDIDATES = int(os.getenv("RERANKER_MAX_CANDIDATES", "20"))
+
+
+@dataclass
+class Candidate:
+    id: str
+    content: str
+    metadata: dict = field(default_factory=dict)
+    score: float = 0.0
+    vector_score: float | None = None
+    keyword_score: float | None = None
+
+
+def reciprocal_rank_fusion(*rankings: list[Candidate], k: int = RRF_K) -> list[Candidate]:
+    """Merge ranked lists by summing 1 / (k + rank); per-source scores are carried over."""
+    fused: dict[str, Candidate] = {}
+    for ranking in rankings:
+        for rank, candidate in enumerate(ranking, start=1):
+            merged = fused.get(candidate.id)
+            if merged is None:
+                merged = fused[candidate.id] = Candidate(candidate.id, candidate.content, candidate.metadata)
+            merged.score += 1.0 / (k + rank)
+            if candidate.vector_score is not None:
+                merged.vector_score = candidate.vector_score
+            if candidate.keyword_score is not None:
+                merged.keyword_score = candidate.keyword_score
+    return sorted(fused.values(), key=lambda c: c.score, reverse=True)
+
+
+class Reranker:
+    """Optional CPU cross-encoder (sentence-transformers), loaded on first use."""
+
+    def __init__(self, model_name: str = RERANKER_MODEL, max_candidates: int = RERANKER_MAX_CANDIDATES):
+        self.model_name = model_name
+        self.max_candidates = max_candidates
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.model_name)
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                self._model = CrossEncoder(self.model_name, device="cpu")
+                logger.info(f"Reranker '{self.model_name}' loaded.")
+        return self._model
+
+    def rerank(self, query: str, candidates: list[Candidate]) -> list[Candidate]:
+        """Reorder the head of the candidate list by cross-encoder score. Blocking; run in a thread."""
+        if not self.enabled or len(candidates) < 2:
+            return candidates
+        head, tail = candidates[:self.max_candidates], candidates[self.max_candidates:]
+        scores = self._load().predict([(query, c.content) for c in head])
+        for candidate, score in zip(head, scores):
+            candidate.score = float(score)
+        return sorted(head, key=lambda c: c.score, reverse=True) + tail
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable
+
+from ingestion import IncrementalIngestor, SyncReport
+
+logger = logging.getLogger("DocIngestorAndRetrieval.ingest_jobs")
+
+# Config
+INGEST_JOBS_KEPT = int(os.getenv("INGEST_JOBS_KEPT", "100"))
+
+
+@dataclass
+class IngestJob:
+    id: str
+    kind: str
+    target: str
+    files: dict[str, str]
+    remove_missing: bool = False
+    scope_dir: str | None = None
+    status: str = "queued"  # queued | running | completed | failed
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+    report: SyncReport = field(default_factory=SyncReport)
+
+    def to_dict(self) -> dict:
+        report = self.report
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "target": self.target,
+            "status": self.status,
+            "error": self.error,
+            "progress": {
+                "files_done": report.files_done,
+                "files_total": report.files_total,
+                "percent": round(100.0 * report.files_done / report.files_total, 1) if report.files_total else 100.0,
+            },
+            "throughput": {
+                "elapsed_seconds": round(elapsed, 2),
+                "chunks_embedded_per_second": round(report.chunks_embedded / elapsed, 2) if elapsed else 0.0,
+                "files_per_second": round(report.files_done / elapsed, 3) if elapsed else 0.0,
+            },
+            "report": asdict(report),
+        }
+
+
+class IngestJobManager:
+    """
+    Runs ingestion jobs one at a time in a worker thread, keeping the most
+    recent jobs for status polling. on_complete runs on the event loop after
+    each job so in-memory indexes can pick up the new chunks.
+    """
+
+    def __init__(self, ingestor: IncrementalIngestor,
+                 on_complete: Callable[[IngestJob], Awaitable[None]] | None = None,
+                 max_jobs: int = INGEST_JOBS_KEPT):
+        self.ingestor = ingestor
+        self.on_complete = on_complete
+        self.max_jobs = max_jobs
+        self.jobs: OrderedDict[str, IngestJob] = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+
+    def submit(self, kind: str, target: str, files: dict[str, str],
+               remove_missing: bool = False, scope_dir: str | None = None) -> IngestJob:
+        job = IngestJob(
+            id=uuid.uuid4().hex[:12], kind=kind, target=target, files=files,
+            remove_missing=remove_missing, scope_dir=scope_dir,
+        )
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.max_jobs:
+            oldest = next(iter(self.jobs.values()))
+            if oldest.status in ("queued", "running"):
+                break
+            self.jobs.popitem(last=False)
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        logger.info(f"Ingest job {job.id} queued: {kind} '{target}' ({len(files)} files)")
+        return job
+
+    def get(self, job_id: str) -> IngestJob | None:
+        return self.jobs.get(job_id)
+
+    async def _run(self, job: IngestJob) -> None:
+        async with self._lock:
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                await asyncio.to_thread(
+                    self.ingestor.sync, job.files,
+                    remove_missing=job.remove_missing, report=job.report, scope_dir=job.scope_dir,
+                )
+                job.status = "failed" if job.report.files_failed else "completed"
+                if job.report.files_failed:
+                    job.error = f"{len(job.report.files_failed)} file(s) failed; resubmit to resume"
+            except Exception as e:
+                logger.error(f"Ingest job {job.id} failed: {e}", exc_info=True)
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+            logger.info(f"Ingest job {job.id} {job.status}: {job.report.chunks_embedded} chunks embedded "
+                        f"in {job.finished_at - job.started_at:.1f}s")
+        if self.on_complete is not None:
+            try:
+                await self.on_complete(job)
+            except Exception as e:
+                logger.error(f"Post-ingest refresh for job {job.id} failed: {e}", exc_info=True)
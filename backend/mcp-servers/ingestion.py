@@ -0,0 +1,511 @@
+"""
+Incremental, streaming ingestion of PDFs into the Supabase `documents` table.
+
+A manifest (JSON) records the SHA-256 of every ingested file and the content
+hash of each of its chunks. Chunk ids are derived from the file, page and
+chunk text, so re-running only embeds chunks that are new, deletes chunks
+that disappeared, and leaves everything else untouched.
+
+Files flow through bounded stages:
+  process pool (hash + parse PDF) -> chunk generator -> embed workers
+  (batched, retried) -> upsert worker (batched) -> manifest
+A checkpoint file records every upserted batch, so an interrupted run
+resumes without re-embedding what was already stored. Files are re-chunked
+when the chunker settings recorded in the manifest change.
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from chunking import CHUNK_OVERLAP_TOKENS, CHUNK_TOKENS, structured_chunks
+from page_store import PAGES_TABLE_NAME, upsert_pages
+
+logger = logging.getLogger("DocIngestorAndRetrieval.ingestion")
+
+# Config
+# "structured" (token-sized, heading-aware, see chunking.py) or "recursive" (fixed 500-char splitter)
+CHUNKER = os.getenv("CHUNKER", "structured").lower()
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "500"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "200"))
+INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS") or os.cpu_count() or 2)
+INGEST_EMBED_CONCURRENCY = int(os.getenv("INGEST_EMBED_CONCURRENCY", "4"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))  # batches buffered between stages
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "5"))
+INGEST_RETRY_BASE_SECONDS = float(os.getenv("INGEST_RETRY_BASE_SECONDS", "1.0"))
+
+MANIFEST_VERSION = 1
+# Files recorded before the manifest tracked the embedding model were all embedded with this one
+LEGACY_EMBEDDING_MODEL = "google:models/embedding-001"
+LEGACY_CHUNKER = "recursive:500/100"
+_CHUNK_NAMESPACE = uuid.UUID("6f1c1a52-3f0e-4c55-9a1b-7d3b7f0e2c41")
+_STOP = object()
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(source_file: str, page_number: int, text_hash: str, occurrence: int = 0) -> str:
+    """Stable id for a chunk; identical text repeated on one page is told apart by occurrence."""
+    return str(uuid.uuid5(_CHUNK_NAMESPACE, f"{source_file}\x1f{page_number}\x1f{text_hash}\x1f{occurrence}"))
+
+
+def with_retry(fn: Callable, *args, attempts: int = INGEST_MAX_RETRIES, base: float = INGEST_RETRY_BASE_SECONDS):
+    """Call fn, retrying with exponential backoff and jitter."""
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt == attempts:
+                raise
+            delay = base * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            logger.warning(f"{getattr(fn, '__name__', 'call')} failed ({e}); retry {attempt}/{attempts - 1} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+# --- Manifest and checkpoint ---
+
+class Manifest:
+    """{"version", "files": {source_file: {"sha256", "path", "pages", "embedding_model", "chunker", "chunks": {...}}}}"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.files: dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.files = data.get("files", {})
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, f)
+        os.replace(tmp, self.path)
+
+
+class Checkpoint:
+    """Append-only log of upserted chunk ids for files not yet committed to the manifest."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.done: dict[tuple[str, str], set[str]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # torn final line from an interrupted write
+                    key = (entry["source_file"], entry["sha256"], entry.get("model"))
+                    self.done.setdefault(key, set()).update(entry["ids"])
+
+    def record(self, source_file: str, file_hash: str, model: str | None, ids: list[str]) -> None:
+        with self._lock:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"source_file": source_file, "sha256": file_hash, "model": model, "ids": ids}) + "\n")
+
+    def clear(self) -> None:
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.done.clear()
+
+
+# --- Parsing and chunking ---
+
+def parse_pdf(path: str, source_file: str, known_hash: str | None = None) -> tuple[str, list[tuple[int, str, dict]] | None]:
+    """
+    Process-pool worker: hash the file and, unless the hash matches known_hash,
+    return its pages as (page_number, text, loader metadata).
+    """
+    file_hash = sha256_file(path)
+    if file_hash == known_hash:
+        return file_hash, None
+    from langchain_community.document_loaders import PyPDFLoader
+
+    pages = [
+        (i + 1, page.page_content, {**page.metadata, "source_file": source_file, "page_number": i + 1})
+        for i, page in enumerate(PyPDFLoader(path).load())
+    ]
+    return file_hash, pages
+
+
+@dataclass
+class Chunk:
+    id: str
+    content: str
+    metadata: dict
+
+
+def chunker_signature(chunker: str = CHUNKER) -> str:
+    """Identifies the chunking settings; files chunked differently are re-chunked."""
+    if chunker == "structured":
+        return f"structured:{CHUNK_TOKENS}/{CHUNK_OVERLAP_TOKENS}t"
+    if chunker == "recursive":
+        return f"recursive:{CHUNK_SIZE}/{CHUNK_OVERLAP}"
+    raise ValueError(f"CHUNKER must be 'structured' or 'recursive', got '{chunker}'")
+
+
+def iter_chunks(pages: list[tuple[int, str, dict]], extra_metadata: dict | None = None,
+                chunker: str = CHUNKER) -> Iterator[Chunk]:
+    """Chunk a document's pages, assigning each chunk its content hash and stable id."""
+    if chunker == "structured":
+        page_metadata = {number: metadata for number, _, metadata in pages}
+        pieces = (
+            (chunk.text, {**page_metadata[chunk.page_number], **chunk.metadata, "chunker": "structured"})
+            for chunk in structured_chunks([(number, text) for number, text, _ in pages])
+        )
+    else:
+        splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        pieces = ((piece, metadata) for _, text, metadata in pages for piece in splitter.split_text(text))
+
+    seen: Counter = Counter()
+    for text, metadata in pieces:
+        text_hash = content_hash(text)
+        key = (metadata["page_number"], text_hash)
+        yield Chunk(
+            id=chunk_id(metadata["source_file"], metadata["page_number"], text_hash, seen[key]),
+            content=text,
+            metadata={**metadata, **(extra_metadata or {}), "content_hash": text_hash},
+        )
+        seen[key] += 1
+
+
+# --- Sync ---
+
+@dataclass
+class SyncReport:
+    files_total: int = 0
+    files_done: int = 0
+    files_unchanged: int = 0
+    files_added: list[str] = field(default_factory=list)
+    files_changed: list[str] = field(default_factory=list)
+    files_removed: list[str] = field(default_factory=list)
+    files_failed: dict[str, str] = field(default_factory=dict)
+    chunks_embedded: int = 0
+    chunks_deleted: int = 0
+    chunks_kept: int = 0
+    chunks_resumed: int = 0
+
+
+@dataclass
+class _FileState:
+    source_file: str
+    path: str
+    file_hash: str
+    pages: int
+    previous: dict | None
+    current: dict[str, str] = field(default_factory=dict)
+    pending_batches: int = 0
+    planned: bool = False
+    error: str | None = None
+
+
+class IncrementalIngestor:
+    """Brings the documents table in line with a set of PDFs through a bounded, parallel pipeline."""
+
+    def __init__(self, client, embeddings, table_name: str, manifest_path: str,
+                 parse_workers: int = INGEST_PARSE_WORKERS, embed_concurrency: int = INGEST_EMBED_CONCURRENCY,
+                 use_processes: bool = True):
+        self.client = client
+        self.embeddings = embeddings
+        self.table_name = table_name
+        self.manifest = Manifest(manifest_path)
+        self.checkpoint = Checkpoint(manifest_path + ".checkpoint.jsonl")
+        # Providers from embeddings.py stamp every chunk with their model and dimension
+        self.embedding_model = getattr(embeddings, "key", None)
+        self._embedding_metadata: dict | None = None
+        self.chunker = chunker_signature()
+        self.parse_workers = max(1, parse_workers)
+        self.embed_concurrency = max(1, embed_concurrency)
+        # Long-running servers parse in threads: spawned workers would re-import the server module
+        self.use_processes = use_processes
+        self._lock = threading.Lock()
+
+    @property
+    def embedding_metadata(self) -> dict:
+        # Resolved on the first ingest: the dimension probe is an embedding call, which
+        # must not run while a server is still importing
+        if self._embedding_metadata is None:
+            self._embedding_metadata = self.embeddings.metadata() if hasattr(self.embeddings, "metadata") else {}
+        return self._embedding_metadata
+
+    def _table(self):
+        return self.client.table(self.table_name)
+
+    def _same_model(self, entry: dict | None) -> bool:
+        if entry is None:
+            return False
+        return self.embedding_model is None or entry.get("embedding_model", LEGACY_EMBEDDING_MODEL) == self.embedding_model
+
+    def _up_to_date(self, entry: dict | None) -> bool:
+        return self._same_model(entry) and entry.get("chunker", LEGACY_CHUNKER) == self.chunker
+
+    def _delete_ids(self, ids: list[str]) -> None:
+        for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+            batch = ids[start:start + UPSERT_BATCH_SIZE]
+            with_retry(lambda: self._table().delete().in_("id", batch).execute())
+
+    def _delete_pages(self, source_file: str, after_page: int = 0) -> None:
+        with_retry(lambda: self.client.table(PAGES_TABLE_NAME).delete()
+                   .eq("source_file", source_file).gt("page_number", after_page).execute())
+
+    # --- Stages ---
+
+    def _embed_worker(self, embed_queue: queue.Queue, upsert_queue: queue.Queue) -> None:
+        while True:
+            item = embed_queue.get()
+            if item is _STOP:
+                return
+            state, batch = item
+            vectors = None
+            if state.error is None:
+                try:
+                    vectors = with_retry(self.embeddings.embed_documents, [chunk.content for chunk in batch])
+                except Exception as e:
+                    self._fail(state, f"embedding failed: {e}")
+            upsert_queue.put((state, batch, vectors))
+
+    def _upsert_worker(self, upsert_queue: queue.Queue, report: SyncReport) -> None:
+        pending: list[tuple[_FileState, list[Chunk], list]] = []
+        while True:
+            item = upsert_queue.get()
+            if item is not _STOP:
+                state, batch, vectors = item
+                if vectors is None:
+                    self._batch_done(state, report)
+                else:
+                    pending.append((state, batch, vectors))
+            rows = sum(len(batch) for _, batch, _ in pending)
+            if pending and (item is _STOP or rows >= UPSERT_BATCH_SIZE or upsert_queue.empty()):
+                self._flush(pending, report)
+                pending = []
+            if item is _STOP:
+                return
+
+    def _flush(self, pending: list, report: SyncReport) -> None:
+        rows = [
+            {"id": chunk.id, "content": chunk.content, "metadata": chunk.metadata, "embedding": vector}
+            for _, batch, vectors in pending
+            for chunk, vector in zip(batch, vectors)
+        ]
+        try:
+            with_retry(lambda: self._table().upsert(rows).execute())
+        except Exception as e:
+            for state, _, _ in pending:
+                self._fail(state, f"upsert failed: {e}")
+        for state, batch, _ in pending:
+            if state.error is None:
+                self.checkpoint.record(state.source_file, state.file_hash, self.embedding_model,
+                                       [chunk.id for chunk in batch])
+                with self._lock:
+                    report.chunks_embedded += len(batch)
+            self._batch_done(state, report)
+
+    def _fail(self, state: _FileState, reason: str) -> None:
+        if state.error is None:
+            logger.error(f"Ingestion of '{state.source_file}' failed: {reason}")
+            state.error = reason
+
+    def _batch_done(self, state: _FileState, report: SyncReport) -> None:
+        with self._lock:
+            state.pending_batches -= 1
+            ready = state.planned and state.pending_batches == 0
+        if ready:
+            self._commit(state, report)
+
+    def _commit(self, state: _FileState, report: SyncReport) -> None:
+        """All of a file's new chunks are stored: drop the stale ones and record it in the manifest."""
+        stale = [old_id for old_id in (state.previous or {}).get("chunks", {}) if old_id not in state.current]
+        if state.error is None:
+            try:
+                self._delete_ids(stale)
+                if state.previous is not None and state.previous.get("pages", 0) > state.pages:
+                    self._delete_pages(state.source_file, after_page=state.pages)
+            except Exception as e:
+                self._fail(state, f"cleanup failed: {e}")
+        with self._lock:
+            report.files_done += 1
+            if state.error is not None:
+                report.files_failed[state.source_file] = state.error
+                return
+            self.manifest.files[state.source_file] = {
+                "sha256": state.file_hash, "path": state.path, "pages": state.pages,
+                "embedding_model": self.embedding_model, "chunker": self.chunker, "chunks": state.current,
+            }
+            self.manifest.save()
+            report.chunks_deleted += len(stale)
+        logger.info(f"Synced '{state.source_file}': {len(state.current)} chunks, {len(stale)} stale deleted.")
+
+    def _plan(self, source_file: str, path: str, file_hash: str, pages: list,
+              embed_queue: queue.Queue, report: SyncReport) -> None:
+        """Chunk a parsed file and queue its new chunks for embedding."""
+        previous = self.manifest.files.get(source_file)
+        resumed = self.checkpoint.done.get((source_file, file_hash, self.embedding_model), set())
+        state = _FileState(source_file, os.path.abspath(path), file_hash, len(pages), previous)
+        if previous is None:
+            if not resumed:
+                # Unknown to the manifest: clear whatever an earlier (non-incremental) run left behind
+                with_retry(lambda: self._table().delete().eq("metadata->>source_file", source_file).execute())
+                self._delete_pages(source_file)
+            with self._lock:
+                report.files_added.append(source_file)
+        else:
+            with self._lock:
+                report.files_changed.append(source_file)
+        with_retry(upsert_pages, self.client, [
+            {"source_file": source_file, "page_number": number, "content": text} for number, text, _ in pages
+        ])
+
+        # Chunks embedded with another model are re-embedded under the same ids
+        known = previous["chunks"] if self._same_model(previous) else {}
+        batch: list[Chunk] = []
+        kept = resumed_count = 0
+        for chunk in iter_chunks(pages, extra_metadata=self.embedding_metadata):
+            state.current[chunk.id] = chunk.metadata["content_hash"]
+            if chunk.id in known:
+                kept += 1
+                continue
+            if chunk.id in resumed:
+                resumed_count += 1
+                continue
+            batch.append(chunk)
+            if len(batch) >= EMBED_BATCH_SIZE:
+                with self._lock:
+                    state.pending_batches += 1
+                embed_queue.put((state, batch))  # blocks while the embed stage is saturated
+                batch = []
+        if batch:
+            with self._lock:
+                state.pending_batches += 1
+            embed_queue.put((state, batch))
+
+        with self._lock:
+            report.chunks_kept += kept
+            report.chunks_resumed += resumed_count
+            state.planned = True
+            ready = state.pending_batches == 0
+        if ready:
+            self._commit(state, report)
+
+    def remove_file(self, source_file: str, report: SyncReport) -> None:
+        entry = self.manifest.files[source_file]
+        self._delete_ids(list(entry["chunks"]))
+        self._delete_pages(source_file)
+        with self._lock:
+            del self.manifest.files[source_file]
+            self.manifest.save()
+            report.files_removed.append(source_file)
+            report.chunks_deleted += len(entry["chunks"])
+
+    def sync(self, files: dict[str, str], remove_missing: bool = False, report: SyncReport | None = None,
+             scope_dir: str | None = None) -> SyncReport:
+        """
+        Ingest {source_file: path}. With remove_missing, manifest files not listed
+        are deleted; scope_dir limits that to files last ingested from that directory.
+        """
+        report = report or SyncReport()
+        # Every report update takes self._lock: embed and upsert workers update it concurrently
+        with self._lock:
+            report.files_total += len(files)
+        # Pick up runs made by other processes (offline CLI or server) since this one started
+        self.manifest = Manifest(self.manifest.path)
+        embed_queue: queue.Queue = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+        upsert_queue: queue.Queue = queue.Queue(maxsize=INGEST_QUEUE_SIZE)
+        embedders = [
+            threading.Thread(target=self._embed_worker, args=(embed_queue, upsert_queue), daemon=True)
+            for _ in range(self.embed_concurrency)
+        ]
+        upserter = threading.Thread(target=self._upsert_worker, args=(upsert_queue, report), daemon=True)
+        for thread in embedders + [upserter]:
+            thread.start()
+
+        try:
+            todo = iter(files.items())
+            executor = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            with executor(max_workers=self.parse_workers) as pool:
+                in_flight: dict = {}
+                while True:
+                    # At most two parsed files per worker wait for the chunk stage
+                    while len(in_flight) < self.parse_workers * 2:
+                        item = next(todo, None)
+                        if item is None:
+                            break
+                        source_file, path = item
+                        entry = self.manifest.files.get(source_file)
+                        known = entry["sha256"] if self._up_to_date(entry) else None
+                        in_flight[pool.submit(parse_pdf, path, source_file, known)] = source_file
+                    if not in_flight:
+                        break
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        source_file = in_flight.pop(future)
+                        try:
+                            file_hash, pages = future.result()
+                            if pages is None:
+                                with self._lock:
+                                    report.files_done += 1
+                                    report.files_unchanged += 1
+                                    report.chunks_kept += len(self.manifest.files[source_file]["chunks"])
+                                continue
+                            self._plan(source_file, files[source_file], file_hash, pages, embed_queue, report)
+                        except Exception as e:
+                            logger.error(f"Failed to ingest '{source_file}': {e}", exc_info=True)
+                            with self._lock:
+                                report.files_done += 1
+                                report.files_failed[source_file] = str(e)
+        finally:
+            for _ in embedders:
+                embed_queue.put(_STOP)
+            for thread in embedders:
+                thread.join()
+            upsert_queue.put(_STOP)
+            upserter.join()
+
+        if remove_missing:
+            for source_file in [f for f in self.manifest.files if f not in files and self._in_scope(f, scope_dir)]:
+                self.remove_file(source_file, report)
+        if not report.files_failed:
+            self.checkpoint.clear()
+        return report
+
+    def sync_directory(self, directory: str, remove_missing: bool = True) -> SyncReport:
+        files = {
+            file: os.path.join(directory, file)
+            for file in sorted(os.listdir(directory))
+            if file.lower().endswith(".pdf")
+        }
+        return self.sync(files, remove_missing=remove_missing, scope_dir=directory)
+
+    def _in_scope(self, source_file: str, scope_dir: str | None) -> bool:
+        path = self.manifest.files[source_file].get("path")
+        # Entries written before paths were recorded all came from the single documents directory
+        if scope_dir is None or path is None:
+            return True
+        return os.path.dirname(path) == os.path.abspath(scope_dir)
@@ -0,0 +1,115 @@
+import logging
+import os
+
+logger = logging.getLogger("DocIngestorAndRetrieval.page_store")
+
+# Config
+PAGES_TABLE_NAME = os.getenv("PAGES_TABLE_NAME", "document_pages")
+PAGE_UPSERT_BATCH_SIZE = int(os.getenv("PAGE_UPSERT_BATCH_SIZE", "200"))
+
+
+def page_records(pages) -> list[dict]:
+    """Page rows for loaded LangChain documents carrying source_file and page_number metadata."""
+    return [
+        {
+            "source_file": page.metadata["source_file"],
+            "page_number": int(page.metadata["page_number"]),
+            "content": page.page_content,
+        }
+        for page in pages
+    ]
+
+
+def upsert_pages(client, records: list[dict], table_name: str = PAGES_TABLE_NAME,
+                 batch_size: int = PAGE_UPSERT_BATCH_SIZE) -> int:
+    """Write page rows with a (sync) Supabase client. Existing pages are overwritten."""
+    for start in range(0, len(records), batch_size):
+        client.table(table_name) \
+            .upsert(records[start:start + batch_size], on_conflict="source_file,page_number") \
+            .execute()
+    return len(records)
+
+
+def merge_chunks(contents: list[str], max_overlap: int = 200, min_overlap: int = 10) -> str:
+    """Join consecutive chunks of one page, dropping the splitter's overlap."""
+    merged = ""
+    for content in contents:
+        overlap = 0
+        for size in range(min(max_overlap, len(merged), len(content)), min_overlap - 1, -1):
+            if merged.endswith(content[:size]):
+                overlap = size
+                break
+        if overlap:
+            merged += content[overlap:]
+        else:
+            merged += ("\n" if merged else "") + content
+    return merged
+
+
+class PageStore:
+    """
+    Page-level reads keyed by (source_file, page_number). Files ingested before
+    the pages table existed are served by reassembling their chunks, which is
+    best effort since the chunk table does not record order within a page.
+    """
+
+    def __init__(self, store, table_name: str = PAGES_TABLE_NAME):
+        self.store = store
+        self.table_name = table_name
+
+    async def _pages(self):
+        return (await self.store.client()).table(self.table_name)
+
+    async def get_range(self, source_file: str, first_page: int, last_page: int) -> list[dict]:
+        """Pages first_page..last_page (inclusive) in order, as dicts with page_number and content."""
+        table = await self._pages()
+        response = await table \
+            .select("page_number, content") \
+            .eq("source_file", source_file) \
+            .gte("page_number", first_page) \
+            .lte("page_number", last_page) \
+            .order("page_number") \
+            .execute()
+        if response.data:
+            return response.data
+        return await self._from_chunks(source_file, first_page, last_page)
+
+    async def get_page(self, source_file: str, page_number: int) -> dict | None:
+        pages = await self.get_range(source_file, page_number, page_number)
+        return pages[0] if pages else None
+
+    async def page_count(self, source_file: str) -> int:
+        table = await self._pages()
+        response = await table \
+            .select("page_number") \
+            .eq("source_file", source_file) \
+            .order("page_number", desc=True) \
+            .limit(1) \
+            .execute()
+        if response.data:
+            return response.data[0]["page_number"]
+
+        chunks = await self.store.table()
+        response = await chunks \
+            .select("page_number:metadata->>page_number") \
+            .eq("metadata->>source_file", source_file) \
+            .execute()
+        return max((int(row["page_number"]) for row in response.data or [] if row.get("page_number")), default=0)
+
+    async def _from_chunks(self, source_file: str, first_page: int, last_page: int) -> list[dict]:
+        chunks = await self.store.table()
+        response = await chunks \
+            .select("id, content, page_number:metadata->>page_number") \
+            .eq("metadata->>source_file", source_file) \
+            .in_("metadata->>page_number", [str(n) for n in range(first_page, last_page + 1)]) \
+            .order("id") \
+            .execute()
+        by_page: dict[int, list[str]] = {}
+        for row in response.data or []:
+            by_page.setdefault(int(row["page_number"]), []).append(row["content"])
+        if by_page:
+            logger.debug(f"Reassembled {len(by_page)} pages of '{source_file}' from chunks.")
+        return [
+            {"page_number": number, "content": merge_chunks(contents)}
+            for number, contents in sorted(by_page.items())
+        ]
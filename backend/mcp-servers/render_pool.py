@@ -0,0 +1,144 @@
+"""
+Bounded process pool for CPU-bound document rendering.
+
+Up to RENDER_WORKERS jobs run at once and up to RENDER_QUEUE_MAX more wait
+for a slot; beyond that run() fails fast with RenderQueueFull. A job that
+exceeds its timeout is abandoned and the pool is recycled, since a stuck
+worker process cannot be cancelled; jobs that were running on the recycled
+pool are retried once on the new one.
+"""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+logger = logging.getLogger("GenerateDocuments.render_pool")
+
+# Config
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS") or min(4, os.cpu_count() or 1))
+RENDER_QUEUE_MAX = int(os.getenv("RENDER_QUEUE_MAX", "32"))
+RENDER_TIMEOUT_SECONDS = float(os.getenv("RENDER_TIMEOUT_SECONDS", "120"))
+
+
+class RenderQueueFull(RuntimeError):
+    pass
+
+
+class RenderTimeout(TimeoutError):
+    pass
+
+
+@dataclass
+class RenderStats:
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    rejected: int = 0
+    pool_restarts: int = 0
+    render_seconds: float = 0.0
+    max_render_seconds: float = 0.0
+    wait_seconds: float = 0.0
+
+
+class RenderPool:
+    def __init__(self, workers: int = RENDER_WORKERS, max_queue: int = RENDER_QUEUE_MAX,
+                 timeout: float = RENDER_TIMEOUT_SECONDS, initializer: Callable | None = None):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.initializer = initializer
+        self.stats = RenderStats()
+        self.queued = 0
+        self.running = 0
+        self._pool: ProcessPoolExecutor | None = None
+        self._generation = 0
+        self._slots = asyncio.Semaphore(self.workers)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=self.initializer)
+        return self._pool
+
+    def _restart(self, reason: str) -> None:
+        pool, self._pool = self._pool, None
+        self._generation += 1
+        self.stats.pool_restarts += 1
+        logger.warning(f"Recycling render pool: {reason}")
+        if pool is not None:
+            # Stuck workers ignore cancellation; terminating them is the only way to get the slot back
+            for process in list(getattr(pool, "_processes", {}).values()):
+                process.terminate()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable, *args, timeout: float | None = None):
+        """Run fn(*args) in a worker process and return its result."""
+        if self.queued >= self.max_queue:
+            self.stats.rejected += 1
+            raise RenderQueueFull(
+                f"Render queue is full ({self.running} running, {self.queued} waiting); try again shortly"
+            )
+        self.stats.submitted += 1
+        self.queued += 1
+        enqueued = time.monotonic()
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.stats.wait_seconds += time.monotonic() - enqueued
+        self.running += 1
+        try:
+            return await self._run(fn, args, timeout or self.timeout)
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    async def _run(self, fn: Callable, args: tuple, timeout: float):
+        name = getattr(fn, "__name__", "render")
+        for attempt in (1, 2):
+            generation = self._generation
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(asyncio.wrap_future(self._executor().submit(fn, *args)), timeout)
+            except asyncio.TimeoutError:
+                self.stats.timed_out += 1
+                self._restart(f"{name} exceeded {timeout:g}s")
+                raise RenderTimeout(f"{name} did not finish within {timeout:g}s")
+            except BrokenProcessPool:
+                if generation != self._generation and attempt == 1:
+                    continue  # the pool was recycled under this job because another one timed out
+                self.stats.failed += 1
+                if generation == self._generation:
+                    self._restart(f"worker crashed during {name}")
+                raise
+            except Exception:
+                self.stats.failed += 1
+                raise
+            elapsed = time.monotonic() - started
+            self.stats.completed += 1
+            self.stats.render_seconds += elapsed
+            self.stats.max_render_seconds = max(self.stats.max_render_seconds, elapsed)
+            logger.info(f"{name} rendered in {elapsed:.2f}s")
+            return result
+
+    def metrics(self) -> dict:
+        stats = self.stats
+        started = stats.submitted - self.queued
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            **{name: round(value, 3) if isinstance(value, float) else value for name, value in asdict(stats).items()},
+            "avg_render_seconds": round(stats.render_seconds / stats.completed, 3) if stats.completed else 0.0,
+            "avg_wait_seconds": round(stats.wait_seconds / started, 3) if started > 0 else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
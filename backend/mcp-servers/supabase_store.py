@@ -0,0 +1,41 @@
+import asyncio
+import logging
+
+from supabase import AsyncClient, acreate_client
+
+logger = logging.getLogger("DocIngestorAndRetrieval.supabase_store")
+
+
+class AsyncSupabaseStore:
+    """
+    Long-lived async Supabase client for the retrieval path. The underlying
+    httpx session is created once and keeps its connections alive, so every
+    search from every agent reuses them without blocking the event loop.
+    """
+
+    def __init__(self, url: str, key: str, table_name: str, query_name: str = "match_documents"):
+        self.url = url
+        self.key = key
+        self.table_name = table_name
+        self.query_name = query_name
+        self._client: AsyncClient | None = None
+        self._lock = asyncio.Lock()
+
+    async def client(self) -> AsyncClient:
+        if self._client is None:
+            async with self._lock:
+                if self._client is None:
+                    self._client = await acreate_client(self.url, self.key)
+                    logger.info("Async Supabase client initialized.")
+        return self._client
+
+    async def table(self):
+        return (await self.client()).table(self.table_name)
+
+    async def match(self, query_embedding: list[float], k: int, filter: dict | None = None) -> list[dict]:
+        """Rows of the match_documents RPC: id, content, metadata and similarity."""
+        client = await self.client()
+        response = await client.rpc(
+            self.query_name, {"query_embedding": query_embedding, "filter": filter or {}}
+        ).limit(k).execute()
+        return response.data or []
@@ -0,0 +1,143 @@
+"""
+PPTX templates from data/doctemplates, loaded once per process.
+
+load() reads every *.pptx into memory, validates it and records its layouts
+and placeholders, so requests can be checked without opening the file.
+presentation(name) hands out a parsed copy: each process keeps one spare copy
+per template and parses the replacement in a background thread once the
+spare is taken, so a render does not wait on disk or on the XML parse.
+"""
+import hashlib
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from io import BytesIO
+
+logger = logging.getLogger("GenerateDocuments.template_registry")
+
+# Config
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+PPT_TEMPLATE_DIR = os.getenv("PPT_TEMPLATE_DIR") or os.path.join(BACKEND_DIR, "data", "doctemplates")
+DEFAULT_PPT_TEMPLATE = os.getenv("DEFAULT_PPT_TEMPLATE", "Orion_Innovation_Template")
+
+
+class TemplateError(ValueError):
+    pass
+
+
+@dataclass
+class PlaceholderInfo:
+    idx: int
+    name: str
+    type: str
+
+
+@dataclass
+class LayoutInfo:
+    index: int
+    name: str
+    placeholders: list[PlaceholderInfo] = field(default_factory=list)
+
+
+@dataclass
+class PptTemplate:
+    name: str
+    path: str
+    sha256: str
+    layouts: list[LayoutInfo]
+    data: bytes = field(repr=False, default=b"")
+
+    def layout(self, index: int) -> LayoutInfo | None:
+        return self.layouts[index] if 0 <= index < len(self.layouts) else None
+
+    def describe(self) -> dict:
+        return {"name": self.name, "layouts": [asdict(layout) for layout in self.layouts]}
+
+
+def _inspect(name: str, path: str, data: bytes) -> PptTemplate:
+    from pptx import Presentation
+
+    prs = Presentation(BytesIO(data))
+    layouts = []
+    for index, layout in enumerate(prs.slide_layouts):
+        placeholders = [
+            PlaceholderInfo(ph.placeholder_format.idx, ph.name, str(ph.placeholder_format.type))
+            for ph in layout.placeholders
+        ]
+        if len({ph.idx for ph in placeholders}) != len(placeholders):
+            raise TemplateError(f"layout {index} '{layout.name}' has duplicate placeholder indexes")
+        layouts.append(LayoutInfo(index, layout.name, placeholders))
+    if not layouts:
+        raise TemplateError("no slide layouts")
+    return PptTemplate(name, path, hashlib.sha256(data).hexdigest(), layouts, data)
+
+
+class TemplateRegistry:
+    def __init__(self, directory: str = PPT_TEMPLATE_DIR, default: str = DEFAULT_PPT_TEMPLATE):
+        self.directory = directory
+        self.default = default
+        self.templates: dict[str, PptTemplate] = {}
+        self.loaded = False
+        self._spares: dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Read and validate every template; broken files are logged and skipped."""
+        templates = {}
+        for filename in sorted(os.listdir(self.directory)) if os.path.isdir(self.directory) else []:
+            if not filename.lower().endswith(".pptx") or filename.startswith("~$"):
+                continue
+            name, path = os.path.splitext(filename)[0], os.path.join(self.directory, filename)
+            try:
+                with open(path, "rb") as f:
+                    templates[name.lower()] = _inspect(name, path, f.read())
+            except Exception as e:
+                logger.error(f"Skipping PPT template '{filename}': {e}")
+                continue
+            layouts = templates[name.lower()].layouts
+            logger.info(f"Loaded PPT template '{name}' with {len(layouts)} layouts: "
+                        + ", ".join(f"{layout.index}={layout.name}" for layout in layouts))
+        with self._lock:
+            self.templates = templates
+            self._spares.clear()
+        self.loaded = True
+        if self.default.lower() not in templates:
+            logger.warning(f"Default PPT template '{self.default}' not found in {self.directory}")
+
+    def names(self) -> list[str]:
+        return [template.name for template in self.templates.values()]
+
+    def get(self, name: str | None = None) -> PptTemplate:
+        template = self.templates.get((name or self.default).lower())
+        if template is None:
+            raise TemplateError(
+                f"Unknown PPT template '{name or self.default}'. Available: {', '.join(self.names()) or 'none'}"
+            )
+        return template
+
+    # --- Copies ---
+
+    def _parse(self, template: PptTemplate):
+        from pptx import Presentation
+
+        return Presentation(BytesIO(template.data))
+
+    def _prime(self, template: PptTemplate) -> None:
+        spare = self._parse(template)
+        with self._lock:
+            if self.templates.get(template.name.lower()) is template:
+                self._spares[template.name.lower()] = spare
+
+    def prime(self) -> None:
+        """Parse a spare copy of every template ahead of the first request."""
+        for template in list(self.templates.values()):
+            self._prime(template)
+
+    def presentation(self, name: str | None = None):
+        """A fresh Presentation of the template that the caller may modify and save."""
+        template = self.get(name)
+        with self._lock:
+            spare = self._spares.pop(template.name.lower(), None)
+        threading.Thread(target=self._prime, args=(template,), daemon=True).start()
+        return spare if spare is not None else self._parse(template)
@@ -0,0 +1,20 @@
+import zipfile
+
+from excel_stream import _convert, infer_column_types, write_excel_sheets
+
+
+def test_overflowing_number_is_not_a_number():
+    assert _convert("number", "1e999") is None
+    assert _convert("number", "-1e999") is None
+    assert _convert("number", "1e308") == 1e308
+    assert infer_column_types(1, [["1.5"], ["1e999"]]) == ["text"]
+
+
+def test_overflowing_number_after_the_sample_is_written_as_text(tmp_path, monkeypatch):
+    monkeypatch.setattr("excel_stream.EXCEL_SAMPLE_ROWS", 1)
+    path = tmp_path / "out.xlsx"
+    write_excel_sheets([{"name": "Data", "csv_data": "amount\n1.5\n1e999\n"}], str(path))
+    with zipfile.ZipFile(path) as xlsx:
+        sheet = xlsx.read("xl/worksheets/sheet1.xml").decode()
+    assert "<v>1.5</v>" in sheet
+    assert "1e999" in sheet
@@ -0,0 +1,295 @@
+"""
+In-process vector store for DocIngestorAndRetrieval.
+
+A snapshot directory holds:
+  embeddings.f32   row-major float32 matrix, L2-normalized, memory-mapped at load
+  records.jsonl    one {"id", "content", "metadata"} object per row
+  index.json       {"count", "dim", "model", ...}
+  hnsw.bin / ivf.npz  optional ANN structures built on first load of a large corpus
+
+Export a snapshot from the Supabase `documents` table with:
+  python mcp-servers/vector_index.py export --out data/embeddings/local_index
+"""
+import argparse
+import json
+import logging
+import os
+from dataclasses import dataclass
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:  # optional, falls back to the NumPy IVF index
+    hnswlib = None
+
+logger = logging.getLogger("DocIngestorAndRetrieval.vector_index")
+
+# Config
+LOCAL_INDEX_BRUTE_FORCE_MAX = int(os.getenv("LOCAL_INDEX_BRUTE_FORCE_MAX", "50000"))
+LOCAL_INDEX_ANN = os.getenv("LOCAL_INDEX_ANN", "auto")  # auto | hnsw | ivf
+LOCAL_INDEX_IVF_NPROBE = int(os.getenv("LOCAL_INDEX_IVF_NPROBE", "8"))
+LOCAL_INDEX_HNSW_EF = int(os.getenv("LOCAL_INDEX_HNSW_EF", "64"))
+
+EMBEDDINGS_FILE = "embeddings.f32"
+RECORDS_FILE = "records.jsonl"
+MANIFEST_FILE = "index.json"
+HNSW_FILE = "hnsw.bin"
+IVF_FILE = "ivf.npz"
+
+_SEARCH_BLOCK_ROWS = 65536
+
+
+@dataclass
+class SearchHit:
+    id: str
+    content: str
+    metadata: dict
+    score: float
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k >= len(scores):
+        return np.argsort(-scores)
+    idx = np.argpartition(-scores, k)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+def write_snapshot(out_dir: str, vectors: np.ndarray, records: list[dict], model: str) -> None:
+    """Write a snapshot atomically; stale ANN structures are removed. vectors is (rows, dim), rows may be 0."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim != 2:
+        raise ValueError(f"vectors must be a (rows, dim) matrix, got shape {vectors.shape}")
+    if len(vectors) != len(records):
+        raise ValueError(f"{len(vectors)} vectors but {len(records)} records")
+    os.makedirs(out_dir, exist_ok=True)
+    vectors = _normalize(vectors)
+
+    tmp_embeddings = os.path.join(out_dir, EMBEDDINGS_FILE + ".tmp")
+    vectors.tofile(tmp_embeddings)
+    tmp_records = os.path.join(out_dir, RECORDS_FILE + ".tmp")
+    with open(tmp_records, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    tmp_manifest = os.path.join(out_dir, MANIFEST_FILE + ".tmp")
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump({"count": int(vectors.shape[0]), "dim": int(vectors.shape[1]), "model": model}, f)
+
+    for name in (HNSW_FILE, IVF_FILE):
+        path = os.path.join(out_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    os.replace(tmp_embeddings, os.path.join(out_dir, EMBEDDINGS_FILE))
+    os.replace(tmp_records, os.path.join(out_dir, RECORDS_FILE))
+    os.replace(tmp_manifest, os.path.join(out_dir, MANIFEST_FILE))
+
+
+class _IVFIndex:
+    """Inverted-file index over k-means centroids, searched with nprobe lists."""
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray):
+        self.centroids = centroids
+        order = np.argsort(assignments, kind="stable")
+        self.order = order
+        self.offsets = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0) -> "_IVFIndex":
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(vectors), n_lists * 64)
+        sample = np.asarray(vectors[rng.choice(len(vectors), sample_size, replace=False)])
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = sample[labels == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), _SEARCH_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + _SEARCH_BLOCK_ROWS])
+            assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return cls(centroids, assignments)
+
+    @classmethod
+    def load(cls, path: str) -> "_IVFIndex":
+        data = np.load(path)
+        return cls(data["centroids"], data["assignments"])
+
+    def save(self, path: str) -> None:
+        assignments = np.empty(len(self.order), dtype=np.int32)
+        for c in range(len(self.centroids)):
+            assignments[self.order[self.offsets[c]:self.offsets[c + 1]]] = c
+        np.savez(path, centroids=self.centroids, assignments=assignments)
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        lists = _top_k(self.centroids @ query, nprobe)
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+
+
+class LocalVectorIndex:
+    """
+    Memory-mapped embedding matrix with exact search for small corpora and
+    HNSW (hnswlib) or IVF for large ones.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.count = self.manifest["count"]
+        self.dim = self.manifest["dim"]
+        self.model = self.manifest.get("model")
+        self.vectors = (
+            np.memmap(os.path.join(directory, EMBEDDINGS_FILE), dtype=np.float32, mode="r", shape=(self.count, self.dim))
+            if self.count
+            else np.zeros((0, self.dim), dtype=np.float32)
+        )
+        with open(os.path.join(directory, RECORDS_FILE), encoding="utf-8") as f:
+            self.records = [json.loads(line) for line in f if line.strip()]
+        if len(self.records) != self.count:
+            raise ValueError(f"Snapshot in {directory} has {self.count} vectors but {len(self.records)} records")
+        self._hnsw = None
+        self._ivf = None
+        if self.count > LOCAL_INDEX_BRUTE_FORCE_MAX:
+            self._load_ann()
+        logger.info(f"Loaded local vector index from {directory}: {self.count} rows, dim {self.dim}, model {self.model}")
+
+    def _load_ann(self) -> None:
+        use_hnsw = LOCAL_INDEX_ANN == "hnsw" or (LOCAL_INDEX_ANN == "auto" and hnswlib is not None)
+        if use_hnsw:
+            if hnswlib is None:
+                raise ImportError("LOCAL_INDEX_ANN=hnsw requires the hnswlib package")
+            index = hnswlib.Index(space="ip", dim=self.dim)
+            path = os.path.join(self.directory, HNSW_FILE)
+            if os.path.exists(path):
+                index.load_index(path, max_elements=self.count)
+            else:
+                logger.info(f"Building HNSW index over {self.count} rows...")
+                index.init_index(max_elements=self.count, ef_construction=200, M=16)
+                for start in range(0, self.count, _SEARCH_BLOCK_ROWS):
+                    block = np.asarray(self.vectors[start:start + _SEARCH_BLOCK_ROWS])
+                    index.add_items(block, np.arange(start, start + len(block)))
+                index.save_index(path)
+            index.set_ef(max(LOCAL_INDEX_HNSW_EF, 1))
+            self._hnsw = index
+        else:
+            path = os.path.join(self.directory, IVF_FILE)
+            if os.path.exists(path):
+                self._ivf = _IVFIndex.load(path)
+            else:
+                logger.info(f"Building IVF index over {self.count} rows...")
+                self._ivf = _IVFIndex.build(self.vectors, n_lists=max(1, int(np.sqrt(self.count))))
+                self._ivf.save(path)
+
+    def _exact(self, query: np.ndarray, k: int, rows: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+        if rows is not None:
+            rows = np.sort(rows)
+            scores = np.asarray(self.vectors[rows]) @ query
+            best = _top_k(scores, k)
+            return rows[best], scores[best]
+        best_idx = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for start in range(0, self.count, _SEARCH_BLOCK_ROWS):
+            scores = np.asarray(self.vectors[start:start + _SEARCH_BLOCK_ROWS]) @ query
+            top = _top_k(scores, k)
+            best_idx = np.concatenate([best_idx, top + start])
+            best_scores = np.concatenate([best_scores, scores[top]])
+        keep = _top_k(best_scores, k)
+        return best_idx[keep], best_scores[keep]
+
+    def search(self, query_vector, k: int = 5) -> list[SearchHit]:
+        if self.count == 0 or k <= 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        if query.shape[0] != self.dim:
+            raise ValueError(f"Query has dim {query.shape[0]} but index '{self.model}' has dim {self.dim}")
+        query = _normalize(query)
+        k = min(k, self.count)
+
+        if self._hnsw is not None:
+            labels, distances = self._hnsw.knn_query(query, k=k)
+            rows, scores = labels[0], 1.0 - distances[0]
+        elif self._ivf is not None:
+            rows, scores = self._exact(query, k, self._ivf.candidates(query, LOCAL_INDEX_IVF_NPROBE))
+        else:
+            rows, scores = self._exact(query, k)
+
+        hits = []
+        for row, score in zip(rows, scores):
+            record = self.records[int(row)]
+            hits.append(SearchHit(
+                id=str(record.get("id")),
+                content=record.get("content", ""),
+                metadata=record.get("metadata") or {},
+                score=float(score),
+            ))
+        return hits
+
+
+def _parse_embedding(value) -> list[float]:
+    if isinstance(value, str):
+        return json.loads(value)
+    return list(value)
+
+
+def export_snapshot(supabase_client, table_name: str, out_dir: str, model: str,
+                    page_size: int = 1000, dim: int = 0) -> int:
+    """
+    Copy every row of the documents table, with its embedding, into a local snapshot.
+    dim is the embedding width recorded when the table is empty.
+    """
+    vectors, records = [], []
+    start = 0
+    while True:
+        response = supabase_client.table(table_name) \
+            .select("id, content, metadata, embedding") \
+            .order("id") \
+            .range(start, start + page_size - 1) \
+            .execute()
+        rows = response.data or []
+        for row in rows:
+            vectors.append(_parse_embedding(row["embedding"]))
+            records.append({"id": str(row["id"]), "content": row["content"], "metadata": row.get("metadata") or {}})
+        logger.info(f"Exported {len(records)} rows...")
+        if len(rows) < page_size:
+            break
+        start += page_size
+    matrix = np.asarray(vectors, dtype=np.float32) if vectors else np.empty((0, dim), dtype=np.float32)
+    write_snapshot(out_dir, matrix, records, model)
+    return len(records)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from supabase.client import create_client
+
+    load_dotenv()
+    from embeddings import DEFAULT_MODELS, EMBEDDING_MODEL_NAME, EMBEDDING_PROVIDER
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s - %(message)s")
+
+    backend_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    parser = argparse.ArgumentParser(description="Local vector index snapshots for DocIngestorAndRetrieval")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Export the Supabase documents table to a local snapshot")
+    export.add_argument("--out", default=os.path.join(backend_dir, "data", "embeddings", "local_index"))
+    export.add_argument("--table", default="documents")
+    export.add_argument(
+        "--model",
+        default=f"{EMBEDDING_PROVIDER}:{EMBEDDING_MODEL_NAME or DEFAULT_MODELS.get(EMBEDDING_PROVIDER, '')}",
+        help="Embedding provider key the rows were embedded with",
+    )
+    export.add_argument("--dim", type=int, default=0, help="Embedding width to record if the table is empty")
+    args = parser.parse_args()
+
+    client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    total = export_snapshot(client, args.table, args.out, args.model, dim=args.dim)
+    print(f"✅ Exported {total} rows to {args.out}")
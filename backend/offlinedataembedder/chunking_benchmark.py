@@ -0,0 +1,128 @@
+"""
+Compare the recursive and structured chunkers on a directory of PDFs.
+
+For each chunker it reports chunk count, embedded tokens, estimated embedding
+cost, the context tokens k results add to a prompt, and page-level recall@k.
+Queries come from --queries (jsonl of {"query", "source_file", "page_number"})
+or are sampled from the corpus: a sentence is picked from a page and every
+third word dropped, so the query is close to, but not a copy of, the text.
+
+    python chunking_benchmark.py --provider hash
+    python chunking_benchmark.py --queries eval.jsonl --k 5
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+from dotenv import load_dotenv
+load_dotenv()
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mcp-servers"))
+import numpy as np
+
+from chunking import count_tokens
+from embeddings import EMBEDDING_PROVIDER, load_embeddings
+from ingestion import iter_chunks, parse_pdf
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+DOCUMENTS_DIR = os.path.join(BACKEND_DIR, "data", "documents", "Policies")
+# USD per 1M input tokens; set to your embedding model's price
+EMBEDDING_COST_PER_MILLION = float(os.getenv("EMBEDDING_COST_PER_MILLION", "0.15"))
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def load_corpus(directory: str) -> dict[str, list[tuple[int, str, dict]]]:
+    corpus = {}
+    for name in sorted(os.listdir(directory)):
+        if name.lower().endswith(".pdf"):
+            _, pages = parse_pdf(os.path.join(directory, name), name)
+            corpus[name] = pages or []
+    return corpus
+
+
+def sample_queries(corpus: dict, count: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    candidates = []
+    for source_file, pages in corpus.items():
+        for page_number, text, _ in pages:
+            for sentence in _SENTENCE.split(" ".join(text.split())):
+                words = sentence.split()
+                if 8 <= len(words) <= 40:
+                    candidates.append((source_file, page_number, words))
+    queries = []
+    for source_file, page_number, words in rng.sample(candidates, min(count, len(candidates))):
+        query = " ".join(word for i, word in enumerate(words) if i % 3 != 2)
+        queries.append({"query": query, "source_file": source_file, "page_number": page_number})
+    return queries
+
+
+def evaluate(chunker: str, corpus: dict, queries: list[dict], embeddings, k: int) -> dict:
+    started = time.perf_counter()
+    chunks = [chunk for pages in corpus.values() for chunk in iter_chunks(pages, chunker=chunker)]
+    chunk_seconds = time.perf_counter() - started
+    tokens = [count_tokens(chunk.content) for chunk in chunks]
+
+    started = time.perf_counter()
+    matrix = np.asarray(embeddings.embed_documents([chunk.content for chunk in chunks]), dtype=np.float32)
+    embed_seconds = time.perf_counter() - started
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+
+    hits, context_tokens = 0, 0
+    if queries:
+        vectors = np.asarray(embeddings.embed_documents([q["query"] for q in queries]), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        top = np.argsort(-(vectors @ matrix.T), axis=1)[:, :k]
+        for query, row in zip(queries, top):
+            context_tokens += sum(tokens[i] for i in row)
+            for i in row:
+                metadata = chunks[i].metadata
+                first = metadata["page_number"]
+                last = metadata.get("page_end", first)
+                if metadata["source_file"] == query["source_file"] and first <= query["page_number"] <= last:
+                    hits += 1
+                    break
+
+    total_tokens = sum(tokens)
+    return {
+        "chunker": chunker,
+        "chunks": len(chunks),
+        "tokens": total_tokens,
+        "avg_tokens": total_tokens / len(chunks) if chunks else 0.0,
+        "cost_usd": total_tokens / 1_000_000 * EMBEDDING_COST_PER_MILLION,
+        "context_tokens": context_tokens / len(queries) if queries else 0.0,
+        "recall": hits / len(queries) if queries else 0.0,
+        "chunk_seconds": chunk_seconds,
+        "embed_seconds": embed_seconds,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the recursive vs structured chunkers")
+    parser.add_argument("--dir", default=DOCUMENTS_DIR, help="Directory of PDFs")
+    parser.add_argument("--provider", default=EMBEDDING_PROVIDER, help="Embedding provider: google | local | hash")
+    parser.add_argument("--queries", help="jsonl of {query, source_file, page_number}; sampled from the corpus if omitted")
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.dir)
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [json.loads(line) for line in f if line.strip()]
+    else:
+        queries = sample_queries(corpus, args.num_queries, args.seed)
+    embeddings = load_embeddings(args.provider)
+    print(f"📄 {len(corpus)} files, {sum(len(p) for p in corpus.values())} pages, "
+          f"{len(queries)} queries, embeddings {embeddings.key}")
+
+    print(f"{'chunker':<11}{'chunks':>8}{'tokens':>10}{'avg':>7}{'cost $':>10}{'ctx@k':>8}{'recall@k':>10}{'embed s':>9}")
+    for chunker in ("recursive", "structured"):
+        r = evaluate(chunker, corpus, queries, embeddings, args.k)
+        print(f"{r['chunker']:<11}{r['chunks']:>8}{r['tokens']:>10}{r['avg_tokens']:>7.0f}{r['cost_usd']:>10.4f}"
+              f"{r['context_tokens']:>8.0f}{r['recall']:>10.3f}{r['embed_seconds']:>9.2f}")
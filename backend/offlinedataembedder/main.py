@@ -1,14 +1,18 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import SupabaseVectorStore
 from supabase.client import create_client
+import argparse
 import os
+import sys
+import time
 
 # === Load ENV ===
 from dotenv import load_dotenv
 load_dotenv()
 
+# Shared ingestion helpers live next to the MCP servers
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mcp-servers"))
+from embeddings import load_embeddings
+from ingestion import IncrementalIngestor
+
 # === ENV Vars ===
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -20,40 +24,32 @@ BASE_URL = os.path.dirname(os.path.abspath(__file__))
 BACKEND_DIR = os.path.abspath(os.path.join(BASE_URL, ".."))
 PERSIST_DIR = os.path.join(BACKEND_DIR, "data", "embeddings")
 DOCUMENTS_DIR = os.path.join(BACKEND_DIR, "data", "documents", "Policies")
-
-# === Embedding model ===
-EMBEDDING_MODEL = GoogleGenerativeAIEmbeddings(
-    model="models/embedding-001",
-    google_api_key=GOOGLE_API_KEY
-)
-
-# === Supabase Client ===
-supabase_client = create_client(SUPABASE_URL, SUPABASE_API_KEY)
-
-# === Load and process documents ===
-docs = []
-for file in os.listdir(DOCUMENTS_DIR):
-    if file.endswith(".pdf"):
-        loader = PyPDFLoader(os.path.join(DOCUMENTS_DIR, file))
-        pages = loader.load()
-        for i, page in enumerate(pages):
-            page.metadata["source_file"] = file
-            page.metadata["page_number"] = i + 1
-            docs.append(page)
-
-# === Chunk text ===
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-documents = text_splitter.split_documents(docs)
-
-print(f"✅ Loaded {len(documents)} chunks from PDFs in {DOCUMENTS_DIR}")
-print(f"Example chunk:\n{documents[0].page_content[:200]}...\n")
-
-# === Store in Supabase vector DB ===
-vectorstore = SupabaseVectorStore.from_documents(
-    documents=documents,
-    embedding=EMBEDDING_MODEL,
-    client=supabase_client,
-    table_name=SUPABASE_TABLE_NAME
-)
-
-print("✅ Embeddings stored in Supabase Vector DB")
+MANIFEST_PATH = os.path.join(PERSIST_DIR, "ingestion_manifest.json")
+
+# The PDF parser runs in a process pool, which re-imports this module on spawn platforms
+if __name__ == "__main__":
+    # === CLI ===
+    parser = argparse.ArgumentParser(description="Incrementally sync a directory of PDFs into Supabase")
+    parser.add_argument("--dir", default=DOCUMENTS_DIR, help="Directory of PDFs to ingest")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="Ingestion manifest path")
+    parser.add_argument("--keep-missing", action="store_true", help="Keep chunks of files no longer in the directory")
+    args = parser.parse_args()
+
+    # === Embedding model (same provider as the docingestor server) ===
+    EMBEDDING_MODEL = load_embeddings()
+
+    # === Supabase Client ===
+    supabase_client = create_client(SUPABASE_URL, SUPABASE_API_KEY)
+
+    # === Sync documents (only new or changed chunks are embedded) ===
+    started = time.perf_counter()
+    ingestor = IncrementalIngestor(supabase_client, EMBEDDING_MODEL, SUPABASE_TABLE_NAME, args.manifest)
+    report = ingestor.sync_directory(args.dir, remove_missing=not args.keep_missing)
+
+    print(f"✅ Synced {args.dir} in {time.perf_counter() - started:.1f}s")
+    print(f"   Files: {len(report.files_added)} added, {len(report.files_changed)} changed, "
+          f"{len(report.files_removed)} removed, {report.files_unchanged} unchanged")
+    print(f"   Chunks: {report.chunks_embedded} embedded, {report.chunks_deleted} deleted, "
+          f"{report.chunks_kept} kept, {report.chunks_resumed} resumed from checkpoint")
+    for source_file, error in report.files_failed.items():
+        print(f"❌ {source_file}: {error} (re-run to resume)")
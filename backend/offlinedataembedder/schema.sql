@@ -0,0 +1,13 @@
+-- Page-level text, one row per PDF page. Chunks in `documents` reference their
+-- page through metadata->>'source_file' and metadata->>'page_number'.
+create table if not exists document_pages (
+    source_file text not null,
+    page_number integer not null,
+    content text not null,
+    updated_at timestamptz not null default now(),
+    primary key (source_file, page_number)
+);
+
+-- Chunk lookups by page, used for files ingested before document_pages existed
+create index if not exists documents_source_page_idx
+    on documents ((metadata->>'source_file'), (metadata->>'page_number'));
@@ -20,6 +20,7 @@ export default function Home() {
   const [panelPosition, setPanelPosition] = useState({ x: 100, y: 100 });
   const [messageInput, setMessageInput] = useState('');
   const [isThinking, setIsThinking] = useState(false);
+  const [toolStatus, setToolStatus] = useState('');
   const [profiles, setProfiles] = useState<AgentProfile[]>([]);
   const [profile, setProfile] = useState<AgentProfile | null>(null);
   const [showDropdown, setShowDropdown] = useState(false);
@@ -177,27 +178,71 @@ export default function Home() {
     }));
     setMessageInput('');
     setIsThinking(true);
+    setToolStatus('');
+
+    // Streamed bot reply lives in the last message slot and is replaced as events arrive
+    let started = false;
+    const setBotText = (text: string) => {
+      const replace = started;
+      started = true;
+      setChatHistory((prev) => {
+        const messages = prev[currentProfileKey] || [];
+        const next = replace ? messages.slice(0, -1) : messages;
+        return { ...prev, [currentProfileKey]: [...next, { text, isUser: false }] };
+      });
+    };
+
     try {
-      const res = await fetch(`${API_BASE_URL}/ask`, {
+      const res = await fetch(`${API_BASE_URL}/ask/stream`, {
         method: 'POST',
         credentials: 'include',
-        headers: { 'Content-Type': 'application/json' },
+        headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
         body: JSON.stringify({ query: messageInput }),
       });
-      const data = await res.json();
-      const botMessage = { text: data.response, isUser: false };
-      setChatHistory((prev) => ({
-        ...prev,
-        [currentProfileKey]: [...(prev[currentProfileKey] || []), botMessage],
-      }));
+      if (!res.ok || !res.body) {
+        const data = await res.json().catch(() => ({}));
+        throw new Error(data.error || `HTTP ${res.status}`);
+      }
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let text = '';
+      let finished = false;
+      while (!finished) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const frames = buffer.split('\n\n');
+        buffer = frames.pop() || '';
+        for (const frame of frames) {
+          const dataLine = frame.split('\n').find((line) => line.startsWith('data: '));
+          if (!dataLine) continue;
+          const event = JSON.parse(dataLine.slice(6));
+          if (event.type === 'token') {
+            text += event.text;
+            setBotText(text);
+          } else if (event.type === 'tool_start') {
+            text = '';
+            setToolStatus(`Using ${event.name}...`);
+          } else if (event.type === 'tool_end') {
+            setToolStatus('');
+          } else if (event.type === 'final') {
+            setBotText(event.response);
+            finished = true;
+          } else if (event.type === 'error') {
+            throw new Error(event.error);
+          }
+        }
+      }
+      // A dropped connection or proxy timeout ends the stream without a final event;
+      // the tokens so far are only part of the answer
+      if (!finished) throw new Error('Stream ended before the final answer');
     } catch {
-      const errorMessage = { text: '⚠️ Error getting response.', isUser: false };
-      setChatHistory((prev) => ({
-        ...prev,
-        [currentProfileKey]: [...(prev[currentProfileKey] || []), errorMessage],
-      }));
+      setBotText('⚠️ Error getting response.');
     } finally {
       setIsThinking(false);
+      setToolStatus('');
     }
   };
 
@@ -346,7 +391,7 @@ export default function Home() {
                   <ReactMarkdown remarkPlugins={[remarkGfm]}>{msg.text}</ReactMarkdown>
                 </div>
               ))}
-              {isThinking && <div className="text-xs text-gray-500 italic">Thinking...</div>}
+              {isThinking && <div className="text-xs text-gray-500 italic">{toolStatus || 'Thinking...'}</div>}
               <div ref={messagesEndRef} />
             </div>
 